@@ -0,0 +1,65 @@
+# fetch_benchmark.py
+"""
+Compare fetch strategies against the local PostgREST stand-in.
+
+Run from the repository root:
+    python -m benchmarks.fetch_benchmark --tweets 20000 --latency 0.05
+    python -m benchmarks.fetch_benchmark --recording data/recording.jsonl --account 12345
+
+Every strategy fetches the same account through the same simulated network, so the
+reported pages/sec and wall time are directly comparable between runs.
+"""
+import argparse
+import logging
+import time
+
+from common.backends import LocalPostgrestTransport, synthetic_tables
+from common.fetch_data import FetchReport, TweetFetcher
+from common.rate_limit import TokenBucket
+
+STRATEGIES = [
+    ('offset', {'pagination': 'offset'}),
+    ('offset x4', {'pagination': 'offset', 'concurrency': 4}),
+    ('offset x8', {'pagination': 'offset', 'concurrency': 8}),
+    ('keyset', {'pagination': 'keyset'}),
+    ('keyset, projected', {'pagination': 'keyset', 'columns': ['created_at', 'favorite_count', 'retweet_count']}),
+]
+
+def run_strategy(fetcher: TweetFetcher, account_id: str, options: dict):
+    report = FetchReport(username=account_id, account_id=account_id)
+    start = time.perf_counter()
+    tweets = fetcher.fetch_all(account_id, report=report, **options)
+    return len(tweets), report.pages, time.perf_counter() - start
+
+def main(args):
+    network = {'latency': args.latency, 'jitter': args.jitter, 'bytes_per_second': args.bandwidth,
+               'error_rate': args.error_rate, 'seed': args.seed}
+    if args.recording:
+        backend = LocalPostgrestTransport.from_recording(args.recording, **network)
+    else:
+        tables = synthetic_tables(accounts=1, tweets_per_account=args.tweets, seed=args.seed)
+        backend = LocalPostgrestTransport(tables, **network)
+
+    account_id = args.account or backend.tables['account'][0]['account_id']
+    # The benchmark measures the strategies, not the production rate limit
+    fetcher = TweetFetcher(url='http://benchmark.local', key='benchmark', backend=backend,
+                           rate_limiter=TokenBucket(rate=1e9, capacity=1e9))
+
+    print(f"{'strategy':<20}{'tweets':>8}{'pages':>7}{'seconds':>10}{'pages/sec':>11}")
+    for name, options in STRATEGIES:
+        tweets, pages, elapsed = run_strategy(fetcher, account_id, options)
+        print(f"{name:<20}{tweets:>8}{pages:>7}{elapsed:>10.2f}{pages / elapsed:>11.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tweet fetch strategies offline")
+    parser.add_argument("--tweets", type=int, default=20000, help="Synthetic tweets for the benchmarked account")
+    parser.add_argument("--recording", help="Serve rows from a RecordingTransport file instead of synthetic data")
+    parser.add_argument("--account", help="Account id to fetch (defaults to the first account)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated round-trip latency")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Simulated bytes per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    main(args)
@@ -0,0 +1,110 @@
+# account_directory.py
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import ACCOUNT_DIRECTORY_FILE, ACCOUNTS_FILE
+from .utils import load_pickle, save_pickle
+
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+class AccountDirectory:
+    """
+    username -> account cache held in memory and mirrored to disk.
+
+    Entries expire after `ttl` seconds. A miss looks the single username up in the
+    `account` table instead of paging through every account; `refresh` reloads the
+    whole table when a full listing is wanted.
+    """
+
+    def __init__(self, fetcher=None, filename: str = ACCOUNT_DIRECTORY_FILE, ttl: float = DEFAULT_TTL):
+        self._fetcher = fetcher
+        self.filename = filename
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}  # username -> (account, fetched_at)
+        self._load()
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            from .fetch_data import AccountFetcher
+            self._fetcher = AccountFetcher()
+        return self._fetcher
+
+    def _load(self):
+        if not os.path.exists(self.filename):
+            return
+        try:
+            self._entries = load_pickle(self.filename)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable account cache {self.filename}: {str(e)}")
+            self._entries = {}
+
+    def _save(self):
+        save_pickle(self._entries, self.filename)
+
+    def _is_fresh(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttl
+
+    def get_account(self, username: str) -> Optional[Dict]:
+        """
+        The account for `username`, or None if the archive has no such account. If the lookup
+        fails, an expired entry is returned with a warning; without one, FetchError is raised.
+        """
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry and self._is_fresh(entry[1]):
+                return entry[0]
+
+        logging.info(f"Account cache miss for {username}, looking it up")
+        from .fetch_data import FetchError
+        try:
+            account = self.fetcher.fetch_by_username(username)
+        except FetchError as e:
+            if entry is None:
+                raise
+            logging.warning(f"Lookup of {username} failed ({str(e)}), using the expired cache entry")
+            return entry[0]
+        if account is None:
+            return None
+
+        with self._lock:
+            self._entries[username] = (account, time.time())
+            self._save()
+        return account
+
+    def get_account_id(self, username: str):
+        account = self.get_account(username)
+        return account['account_id'] if account else None
+
+    def refresh(self) -> List[Dict]:
+        """Reload every account from the API, replacing the cache. Also rewrites ACCOUNTS_FILE."""
+        from .fetch_data import FetchError
+        try:
+            accounts = self.fetcher.fetch_all()
+        except FetchError:
+            accounts = []
+        if not accounts:
+            logging.warning("Account refresh returned no accounts, keeping the existing cache")
+            return []
+
+        now = time.time()
+        with self._lock:
+            self._entries = {str(account['username']): (account, now) for account in accounts}
+            self._save()
+        save_pickle(accounts, ACCOUNTS_FILE)
+        return accounts
+
+_directory = None
+_directory_lock = threading.Lock()
+
+def get_account_directory() -> AccountDirectory:
+    """The shared directory; its cache file is read once, and lookups from parallel user fetches hit one copy."""
+    global _directory
+    with _directory_lock:
+        if _directory is None:
+            _directory = AccountDirectory()
+        return _directory
@@ -0,0 +1,162 @@
+# archive.py
+"""
+Whole-archive tweets as a Parquet dataset, hive-partitioned by account and month:
+
+    data/archive/account_id=<id>/month=<YYYY-MM>/part-0.parquet
+
+Files are memory-mapped on read. Account and date filters prune whole partitions before any
+file is opened, the remaining rows are filtered inside the scan, and only the requested
+columns are decoded, so one user's month costs a few small reads rather than unpickling
+the entire archive.
+"""
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from config import ARCHIVE_DIR, TWEETS_FILE
+from .tweet import Tweet, to_timestamp
+from .utils import load_pickle
+from .registry import get_registry
+
+SCHEMA = pa.schema([
+    ('tweet_id', pa.string()),
+    ('created_ts', pa.int64()),
+    ('full_text', pa.string()),
+    ('favorite_count', pa.int64()),
+    ('retweet_count', pa.int64()),
+    ('reply_to_tweet_id', pa.string()),
+    ('account_id', pa.string()),
+    ('month', pa.string()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('account_id', pa.string()), ('month', pa.string())]), flavor='hive')
+
+WRITE_BATCH_SIZE = 100_000
+
+def _month(ts: int) -> str:
+    return time.strftime('%Y-%m', time.gmtime(ts))
+
+def _record_batch(tweets: List[Tweet]) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pydict({
+        'tweet_id': [t.tweet_id for t in tweets],
+        'created_ts': [t.created_ts for t in tweets],
+        'full_text': [t.full_text for t in tweets],
+        'favorite_count': [t.favorite_count for t in tweets],
+        'retweet_count': [t.retweet_count for t in tweets],
+        'reply_to_tweet_id': [t.reply_to_tweet_id for t in tweets],
+        'account_id': [t.account_id for t in tweets],
+        'month': [_month(t.created_ts) for t in tweets],
+    }, schema=SCHEMA)
+
+def _record_batches(batches: Iterable[List[Union[Tweet, Dict]]]) -> Iterator[pa.RecordBatch]:
+    pending = []
+    for batch in batches:
+        pending.extend(Tweet.coerce(tweet) for tweet in batch)
+        if len(pending) >= WRITE_BATCH_SIZE:
+            yield _record_batch(pending)
+            pending = []
+    if pending:
+        yield _record_batch(pending)
+
+def archive_exists(root: str = ARCHIVE_DIR) -> bool:
+    return os.path.isdir(root) and any(name.startswith('account_id=') for name in os.listdir(root))
+
+def write_archive(batches: Iterable[List[Union[Tweet, Dict]]], root: str = ARCHIVE_DIR) -> int:
+    """
+    Write tweets, given as an iterable of batches, as the partitioned dataset at `root`.
+    The dataset is built beside `root` and swapped in at the end with two renames (the old
+    archive aside, the new one into place), so readers never see a half-written archive,
+    and `root` is missing only between the renames. Returns the number of tweets written.
+    """
+    written = 0
+
+    def counted():
+        nonlocal written
+        for record_batch in _record_batches(batches):
+            written += record_batch.num_rows
+            yield record_batch
+
+    staging = root + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    ds.write_dataset(counted(), staging, schema=SCHEMA, format='parquet', partitioning=PARTITIONING,
+                     basename_template='part-{i}.parquet', max_partitions=1_000_000,
+                     existing_data_behavior='overwrite_or_ignore')
+    # A non-empty directory cannot be replaced in one rename, so move the old one aside first
+    old = root + '.old'
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(root):
+        os.replace(root, old)
+    os.replace(staging, root)
+    shutil.rmtree(old, ignore_errors=True)
+    logging.info(f"Wrote {written} tweets to archive {root}")
+    return written
+
+def open_archive(root: str = ARCHIVE_DIR) -> ds.Dataset:
+    # Discovering the partitions lists every directory, so the handle is kept in the registry
+    return get_registry().get(root, lambda: ds.dataset(root, format='parquet', partitioning=PARTITIONING,
+                                                       filesystem=pafs.LocalFileSystem(use_mmap=True)))
+
+def _filter(account_ids: Optional[Iterable[str]],
+            start_date: Optional[Union[str, date, datetime]],
+            end_date: Optional[Union[str, date, datetime]]) -> Optional[ds.Expression]:
+    # Conditions on the partition fields (account_id, month) let the scan skip whole directories
+    conditions = []
+    if account_ids is not None:
+        conditions.append(ds.field('account_id').isin([str(a) for a in account_ids]))
+    if start_date is not None:
+        start_ts = to_timestamp(start_date)
+        conditions += [ds.field('month') >= _month(start_ts), ds.field('created_ts') >= start_ts]
+    if end_date is not None:
+        end_ts = to_timestamp(end_date)
+        conditions += [ds.field('month') <= _month(end_ts), ds.field('created_ts') <= end_ts]
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def iter_archive(root: str = ARCHIVE_DIR,
+                 account_ids: Optional[Iterable[str]] = None,
+                 start_date: Optional[Union[str, date, datetime]] = None,
+                 end_date: Optional[Union[str, date, datetime]] = None,
+                 columns: Optional[List[str]] = None,
+                 batch_size: int = 10_000) -> Iterator[List[Tweet]]:
+    """
+    Archive tweets as batches of Tweet records, optionally limited to some accounts and a
+    date range. Fields outside `columns` (API names, e.g. 'created_at') are never read.
+    """
+    fields = [c for c in Tweet.__slots__ if c not in ('tweet_id', 'account_id', 'created_ts')
+              and (columns is None or c in columns)]
+    selected = ['tweet_id', 'account_id', 'created_ts'] + fields
+    scanner = open_archive(root).scanner(columns=selected, filter=_filter(account_ids, start_date, end_date),
+                                         batch_size=batch_size)
+    for record_batch in scanner.to_batches():
+        if record_batch.num_rows == 0:
+            continue
+        data = record_batch.to_pydict()
+        yield [Tweet(tweet_id, sys.intern(account_id), created_ts, **dict(zip(fields, rest)))
+               for tweet_id, account_id, created_ts, *rest in zip(*(data[c] for c in selected))]
+
+def load_archive(root: str = ARCHIVE_DIR,
+                 account_ids: Optional[Iterable[str]] = None,
+                 start_date: Optional[Union[str, date, datetime]] = None,
+                 end_date: Optional[Union[str, date, datetime]] = None,
+                 columns: Optional[List[str]] = None) -> List[Tweet]:
+    """All of `iter_archive` in one list."""
+    tweets = [tweet for batch in iter_archive(root, account_ids, start_date, end_date, columns) for tweet in batch]
+    logging.info(f"Loaded {len(tweets)} tweets from archive {root}")
+    return tweets
+
+def build_archive_main(args):
+    """Convert a pickled tweet list (TWEETS_FILE by default) into the partitioned archive."""
+    filename = getattr(args, 'input', None) or TWEETS_FILE
+    tweets = load_pickle(filename)
+    logging.info(f"Converting {len(tweets)} tweets from {filename}")
+    return write_archive(tweets[i:i + WRITE_BATCH_SIZE] for i in range(0, len(tweets), WRITE_BATCH_SIZE))
@@ -0,0 +1,343 @@
+# backends.py
+"""
+Pluggable HTTP backends for SupabaseClient.
+
+RecordingTransport forwards requests to the real archive and appends every exchange to a
+JSON-lines file. LocalPostgrestTransport answers the subset of PostgREST the fetchers use
+from rows held in memory (recorded or synthetic), with optional latency, bandwidth and
+error injection, so fetch strategies can be measured offline and reproducibly.
+
+Set SUPABASE_BACKEND to pick one for every fetcher in the process:
+    record:<file>      record live responses to <file>
+    local:<file>       serve the rows found in a recording
+    synthetic          serve a generated archive
+"""
+import bisect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from postgrest import SyncPostgrestClient
+
+from .tweet import to_timestamp
+
+PRIMARY_KEYS = {'tweets': 'tweet_id', 'account': 'account_id'}
+TIMESTAMP_COLUMNS = {'created_at', 'updated_at'}
+
+def create_postgrest_client(url: str, key: str, transport: httpx.BaseTransport) -> SyncPostgrestClient:
+    """A PostgREST client for the Supabase REST endpoint at `url`, sending requests through `transport`."""
+    client = SyncPostgrestClient(f"{url.rstrip('/')}/rest/v1",
+                                 headers={'apikey': key, 'Authorization': f'Bearer {key}'})
+    session = client.session
+    client.session = httpx.Client(base_url=session.base_url, headers=session.headers,
+                                  timeout=session.timeout, transport=transport)
+    return client
+
+class RecordingTransport(httpx.BaseTransport):
+    """Pass requests through to the network and append each request/response pair to `filename`."""
+
+    def __init__(self, filename: str, transport: Optional[httpx.BaseTransport] = None):
+        self.filename = filename
+        self.transport = transport or httpx.HTTPTransport(http2=True)
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.transport.handle_request(request)
+        body = response.read()
+        entry = {
+            'method': request.method,
+            'path': request.url.path,
+            'params': list(request.url.params.multi_items()),
+            'status': response.status_code,
+            'body': body.decode('utf-8', errors='replace'),
+        }
+        with self._lock:
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        return httpx.Response(response.status_code, headers=response.headers, content=body)
+
+@lru_cache(maxsize=None)
+def _epoch(value: str) -> float:
+    return float(to_timestamp(value))
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas that are not inside parentheses or double quotes."""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+def _parse_condition(text: str):
+    """('and'|'or', [conditions]) for logic groups, or (column, op, value) for a single filter."""
+    for logic in ('and', 'or'):
+        if text.startswith(logic + '('):
+            return logic, [_parse_condition(part) for part in _split_top_level(text[len(logic) + 1:-1])]
+    column, op, value = text.split('.', 2)
+    return column, op, _unquote(value)
+
+class LocalPostgrestTransport(httpx.BaseTransport):
+    """
+    In-process stand-in for the archive's PostgREST API.
+
+    Supports select, order, limit/offset, eq/neq/gt/gte/lt/lte/fts filters and or/and
+    groups. Like Postgres with an index, a range on the leading sort column, or a keyset
+    `or` filter on the first two sort columns, seeks directly to the cursor, while OFFSET
+    still walks past the skipped rows.
+
+    `latency` (seconds, plus up to `jitter`) is slept per request, `bytes_per_second`
+    throttles response bodies and `error_rate` answers that fraction of requests with 503.
+    """
+
+    def __init__(self, tables: Dict[str, List[Dict]], latency: float = 0.0, jitter: float = 0.0,
+                 bytes_per_second: Optional[float] = None, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.tables = tables
+        self.latency = latency
+        self.jitter = jitter
+        self.bytes_per_second = bytes_per_second
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._views = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_recording(cls, filename: str, **kwargs) -> 'LocalPostgrestTransport':
+        """Serve every distinct row seen in successful responses of a RecordingTransport file."""
+        tables: Dict[str, Dict] = {}
+        with open(filename, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['status'] != 200:
+                    continue
+                table = entry['path'].rsplit('/', 1)[-1]
+                key = PRIMARY_KEYS.get(table)
+                rows = tables.setdefault(table, {})
+                for row in json.loads(entry['body']):
+                    rows[row.get(key, len(rows))] = row
+        return cls({table: list(rows.values()) for table, rows in tables.items()}, **kwargs)
+
+    @staticmethod
+    def _value(column: str, value):
+        if value is None:
+            return ''
+        if column in TIMESTAMP_COLUMNS:
+            return _epoch(value)
+        return value
+
+    def _compare(self, row: Dict, column: str, op: str, value: str) -> bool:
+        if op == 'fts':
+            text = (row.get(column) or '').lower()
+            words = set(text.split())
+            return any(term.strip().lower() in words for term in value.split('|'))
+        if op == 'is':
+            return row.get(column) is None if value == 'null' else row.get(column) is not None
+        actual = row.get(column)
+        if column in TIMESTAMP_COLUMNS and actual is not None:
+            actual, value = _epoch(actual), _epoch(value)
+        elif isinstance(actual, (int, float)) and not isinstance(actual, bool):
+            value = float(value)
+        elif actual is not None:
+            actual = str(actual)
+        if op == 'eq':
+            return actual == value
+        if op == 'neq':
+            return actual != value
+        if actual is None:
+            return False
+        return {'gt': actual > value, 'gte': actual >= value, 'lt': actual < value, 'lte': actual <= value}[op]
+
+    def _matches(self, row: Dict, condition) -> bool:
+        if condition[0] in ('and', 'or') and isinstance(condition[1], list):
+            results = (self._matches(row, c) for c in condition[1])
+            return all(results) if condition[0] == 'and' else any(results)
+        return self._compare(row, *condition)
+
+    def _view(self, table: str, eq_filters: Tuple, order: Tuple[str, ...]):
+        """Rows of `table` matching the eq filters, sorted ascending by `order`, with bisect keys. Cached."""
+        key = (table, eq_filters, order)
+        with self._lock:
+            if key not in self._views:
+                rows = [row for row in self.tables.get(table, [])
+                        if all(self._compare(row, column, 'eq', value) for column, value in eq_filters)]
+                rows.sort(key=lambda row: tuple(self._value(c, row.get(c)) for c in order))
+                keys = [tuple(self._value(c, row.get(c)) for c in order) for row in rows]
+                self._views[key] = (rows, keys)
+            return self._views[key]
+
+    def _bounds(self, keys: List[Tuple], order: Tuple[str, ...], conditions: List) -> Tuple[int, int, List]:
+        """Narrow [lo, hi) with the conditions an index could seek on; return the rest as residual filters."""
+        lo, hi = 0, len(keys)
+        residual = []
+        firsts = pairs = None
+        for condition in conditions:
+            column, op, value = condition if len(condition) == 3 else (None, None, None)
+            if order and column == order[0] and op in ('gt', 'gte', 'lt', 'lte'):
+                firsts = firsts if firsts is not None else [k[0] for k in keys]
+                bound = self._value(column, value)
+                if op == 'gt':
+                    lo = max(lo, bisect.bisect_right(firsts, bound))
+                elif op == 'gte':
+                    lo = max(lo, bisect.bisect_left(firsts, bound))
+                elif op == 'lt':
+                    hi = min(hi, bisect.bisect_left(firsts, bound))
+                else:
+                    hi = min(hi, bisect.bisect_right(firsts, bound))
+                continue
+            cursor = self._keyset_cursor(condition, order)
+            if cursor is not None:
+                pairs = pairs if pairs is not None else [k[:2] for k in keys]
+                op, bound = cursor
+                if op == 'lt':
+                    hi = min(hi, bisect.bisect_left(pairs, bound))
+                else:
+                    lo = max(lo, bisect.bisect_right(pairs, bound))
+                continue
+            residual.append(condition)
+        return lo, hi, residual
+
+    def _keyset_cursor(self, condition, order: Tuple[str, ...]):
+        """Recognise `or(a.op.X, and(a.eq.X, b.op.Y))` on the first two sort columns as a tuple bound."""
+        if condition[0] != 'or' or len(order) < 2 or len(condition[1]) != 2:
+            return None
+        first, second = condition[1]
+        if len(first) != 3 or second[0] != 'and' or len(second[1]) != 2:
+            return None
+        (a1, op1, x1), ((a2, op2, x2), (b, op3, y)) = first, second[1]
+        if not (a1 == a2 == order[0] and b == order[1]):
+            return None
+        if op2 != 'eq' or x1 != x2 or op1 != op3 or op1 not in ('lt', 'gt'):
+            return None
+        return op1, (self._value(a1, x1), self._value(b, y))
+
+    def query(self, table: str, params: List[Tuple[str, str]]) -> List[Dict]:
+        select, order, descending, limit, offset = None, (), False, None, 0
+        eq_filters, conditions = [], []
+        for name, value in params:
+            if name == 'select':
+                select = None if value == '*' else value.split(',')
+            elif name == 'order':
+                parts = [part.split('.') for part in value.split(',')]
+                order = tuple(part[0] for part in parts)
+                directions = {len(part) > 1 and part[1] == 'desc' for part in parts}
+                if len(directions) > 1:
+                    raise ValueError("Mixed sort directions are not supported")
+                descending = directions.pop()
+            elif name == 'limit':
+                limit = int(value)
+            elif name == 'offset':
+                offset = int(value)
+            elif name in ('or', 'and'):
+                conditions.append(_parse_condition(f'{name}{value}'))
+            else:
+                op, criteria = value.split('.', 1)
+                if op == 'eq':
+                    eq_filters.append((name, _unquote(criteria)))
+                else:
+                    conditions.append((name, op, _unquote(criteria)))
+
+        rows, keys = self._view(table, tuple(eq_filters), order)
+        lo, hi, residual = self._bounds(keys, order, conditions)
+        indices = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+
+        result = []
+        for i in indices:
+            row = rows[i]
+            if residual and not all(self._matches(row, c) for c in residual):
+                continue
+            if offset:
+                offset -= 1
+                continue
+            result.append(row if select is None else {c: row.get(c) for c in select})
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self.error_rate and self._random.random() < self.error_rate:
+            # Like a gateway error: the status is the only sign the failure is transient
+            return httpx.Response(503, json={'message': 'Injected failure'})
+
+        table = request.url.path.rsplit('/', 1)[-1]
+        try:
+            rows = self.query(table, list(request.url.params.multi_items()))
+        except (ValueError, KeyError) as e:
+            return httpx.Response(400, json={'message': str(e), 'code': 'PGRST100'})
+
+        body = json.dumps(rows).encode()
+        if self.bytes_per_second:
+            time.sleep(len(body) / self.bytes_per_second)
+        return httpx.Response(200, headers={'Content-Type': 'application/json'}, content=body)
+
+WORDS = ('archive thread reply post tweet community idea think people good time day work new make '
+         'love read write build open data graph mood trend keyword great today really know').split()
+
+def synthetic_tables(accounts: int = 10, tweets_per_account: int = 5000, reply_fraction: float = 0.3,
+                     start_ts: int = 1388534400, seed: int = 0) -> Dict[str, List[Dict]]:
+    """A generated archive shaped like the real tables: accounts plus tweets with replies between them."""
+    rng = random.Random(seed)
+    account_rows = [{'account_id': str(1000 + i), 'username': f'user{i}', 'account_display_name': f'User {i}'}
+                    for i in range(accounts)]
+    span = 10 * 365 * 86400
+    timestamps = sorted(start_ts + rng.randrange(span) for _ in range(accounts * tweets_per_account))
+    tweet_rows = []
+    for i, ts in enumerate(timestamps):
+        reply_to = None
+        if tweet_rows and rng.random() < reply_fraction:
+            reply_to = tweet_rows[rng.randrange(max(0, len(tweet_rows) - 500), len(tweet_rows))]['tweet_id']
+        tweet_rows.append({
+            'tweet_id': str(10 ** 17 + i),
+            'account_id': account_rows[rng.randrange(accounts)]['account_id'],
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(ts)),
+            'full_text': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 30))),
+            'favorite_count': rng.randint(0, 200),
+            'retweet_count': rng.randint(0, 50),
+            'reply_to_tweet_id': reply_to,
+        })
+    return {'account': account_rows, 'tweets': tweet_rows}
+
+_env_backend = None
+_env_backend_lock = threading.Lock()
+
+def backend_from_env() -> Optional[httpx.BaseTransport]:
+    """The process-wide backend selected by SUPABASE_BACKEND, or None for the live API."""
+    global _env_backend
+    spec = os.getenv('SUPABASE_BACKEND')
+    if not spec:
+        return None
+    with _env_backend_lock:
+        if _env_backend is None:
+            kind, _, target = spec.partition(':')
+            if kind == 'record':
+                _env_backend = RecordingTransport(target)
+            elif kind == 'local':
+                _env_backend = LocalPostgrestTransport.from_recording(target)
+            elif kind == 'synthetic':
+                _env_backend = LocalPostgrestTransport(synthetic_tables())
+            else:
+                raise ValueError(f"Unknown SUPABASE_BACKEND: {spec}")
+            logging.info(f"Using {kind} Supabase backend")
+        return _env_backend
@@ -0,0 +1,75 @@
+# checkpoint.py
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import CHECKPOINT_DIR
+
+class FetchCheckpoint:
+    """
+    On-disk progress for a long fetch: every completed page is written to its own file and
+    `progress.json` records the keyset cursor after it. Both are replaced atomically, so a
+    crash at any point leaves the checkpoint at the last fully written page.
+    """
+
+    def __init__(self, params: Dict, root: str = CHECKPOINT_DIR):
+        self.params = params
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        self.path = os.path.join(root, digest)
+        self.progress_file = os.path.join(self.path, 'progress.json')
+        os.makedirs(self.path, exist_ok=True)
+        self.progress = self._load_progress()
+
+    def _load_progress(self) -> Dict:
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file) as f:
+                progress = json.load(f)
+            logging.info(f"Resuming fetch from checkpoint {self.path}: {progress['batches']} batches, "
+                         f"{progress['tweets']} tweets")
+            return progress
+        return {'params': json.loads(json.dumps(self.params, default=str)), 'cursor': None,
+                'batches': 0, 'tweets': 0, 'complete': False}
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _batch_file(self, index: int) -> str:
+        return os.path.join(self.path, f'batch_{index:06d}.pkl')
+
+    @property
+    def cursor(self) -> Optional[Tuple[str, str]]:
+        return tuple(self.progress['cursor']) if self.progress['cursor'] else None
+
+    @property
+    def complete(self) -> bool:
+        return self.progress['complete']
+
+    def save_batch(self, batch: List[Dict], cursor: Tuple[str, str]):
+        self._write_atomic(self._batch_file(self.progress['batches']), pickle.dumps(batch))
+        self.progress['batches'] += 1
+        self.progress['tweets'] += len(batch)
+        self.progress['cursor'] = list(cursor)
+        self._write_atomic(self.progress_file, json.dumps(self.progress).encode())
+
+    def mark_complete(self):
+        self.progress['complete'] = True
+        self._write_atomic(self.progress_file, json.dumps(self.progress).encode())
+
+    def iter_batches(self) -> Iterator[List[Dict]]:
+        for index in range(self.progress['batches']):
+            with open(self._batch_file(index), 'rb') as f:
+                yield pickle.load(f)
+
+    def load_all(self) -> List[Dict]:
+        return [tweet for batch in self.iter_batches() for tweet in batch]
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
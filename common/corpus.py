@@ -0,0 +1,78 @@
+# corpus.py
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .tweet import Tweet
+
+class AccountTable:
+    """Dense account index: account_id <-> small integer, assigned in order of first appearance."""
+
+    def __init__(self, account_ids: Iterable[str] = ()):
+        self.account_ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        for account_id in account_ids:
+            self.index_of(account_id)
+
+    def __len__(self):
+        return len(self.account_ids)
+
+    def index_of(self, account_id: str) -> int:
+        """The account's index, adding it to the table if it is new."""
+        index = self._index.get(account_id)
+        if index is None:
+            index = self._index[account_id] = len(self.account_ids)
+            self.account_ids.append(account_id)
+        return index
+
+    def find(self, account_id: str) -> Optional[int]:
+        return self._index.get(str(account_id))
+
+class TweetCorpus:
+    """
+    Tweets held with an integer account column instead of per-tweet account strings.
+
+    Rows are sorted by (account index, created_ts), so `offsets[i]:offsets[i + 1]` is
+    account i's slice and a date range within it is two binary searches. Queries without
+    an account filter use a vectorized comparison over the whole `created_ts` column.
+    """
+
+    def __init__(self, tweets: Iterable[Union[Tweet, Dict]], accounts: Optional[AccountTable] = None):
+        tweets = [Tweet.coerce(tweet) for tweet in tweets]
+        self.accounts = accounts if accounts is not None else AccountTable()
+        account_idx = np.fromiter((self.accounts.index_of(t.account_id) for t in tweets), dtype=np.int32,
+                                  count=len(tweets))
+        created_ts = np.fromiter((t.created_ts for t in tweets), dtype=np.int64, count=len(tweets))
+
+        order = np.lexsort((created_ts, account_idx))
+        self.tweets: List[Tweet] = [tweets[i] for i in order]
+        self.account_idx = account_idx[order]
+        self.created_ts = created_ts[order]
+        self.offsets = np.searchsorted(self.account_idx, np.arange(len(self.accounts) + 1))
+
+    def __len__(self):
+        return len(self.tweets)
+
+    def positions(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                  account_indices: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Row positions of tweets in [start_ts, end_ts] (inclusive), optionally only for some accounts."""
+        start_ts = np.iinfo(np.int64).min if start_ts is None else start_ts
+        end_ts = np.iinfo(np.int64).max if end_ts is None else end_ts
+        if account_indices is None:
+            return np.flatnonzero((self.created_ts >= start_ts) & (self.created_ts <= end_ts))
+
+        ranges = []
+        for index in account_indices:
+            lo, hi = self.offsets[index], self.offsets[index + 1]
+            account_ts = self.created_ts[lo:hi]
+            ranges.append(np.arange(lo + np.searchsorted(account_ts, start_ts, 'left'),
+                                    lo + np.searchsorted(account_ts, end_ts, 'right')))
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def select(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+               account_ids: Optional[Iterable[str]] = None) -> List[Tweet]:
+        """Tweets in the date range, limited to `account_ids` when given. Unknown ids match nothing."""
+        account_indices = None
+        if account_ids is not None:
+            account_indices = [i for i in (self.accounts.find(a) for a in account_ids) if i is not None]
+        return [self.tweets[i] for i in self.positions(start_ts, end_ts, account_indices)]
@@ -1,12 +1,19 @@
 # fetch_data.py
-import time
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-from typing import List, Dict, Optional, Union
+from dataclasses import dataclass
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 from config import SUPABASE_URL, DATA_DIR
 from .utils import save_pickle
-from dateutil.parser import parse
+from .tweet import Tweet, to_timestamp
+from .checkpoint import FetchCheckpoint
+from .tweet_store import TweetStore
+from .account_directory import get_account_directory
+from .rate_limit import TokenBucket, call_with_retries, default_rate_limiter, raise_for_transient_status
+from .backends import backend_from_env, create_postgrest_client
+from .archive import write_archive
 from datetime import datetime
 from supabase import create_client, Client
 
@@ -15,20 +22,67 @@ load_dotenv()
 API_TOKEN = os.getenv('API_TOKEN')
 logging.basicConfig(level=logging.INFO)
 
+class FetchError(Exception):
+    """A request failed permanently, or kept failing transiently after every retry."""
+
+@dataclass
+class FetchReport:
+    username: str
+    account_id: Optional[str] = None
+    tweets: int = 0
+    pages: int = 0
+    complete: bool = False
+    error: Optional[str] = None
+
 class SupabaseClient:
-    def __init__(self):
-        self.client: Client = create_client(SUPABASE_URL, API_TOKEN)
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None,
+                 rate_limiter: Optional[TokenBucket] = None, max_retries: int = 5, backend=None):
+        # `backend` is an httpx transport (see common/backends.py) used to record the live API or
+        # to serve a local stand-in; without one, SUPABASE_BACKEND or the live archive is used
+        backend = backend or backend_from_env()
+        if backend is None:
+            self.client: Client = create_client(url or SUPABASE_URL, key or API_TOKEN)
+        else:
+            self.client = create_postgrest_client(url or SUPABASE_URL or 'http://localhost', key or API_TOKEN or '',
+                                                  backend)
+        session = (self.client.postgrest if backend is None else self.client).session
+        session.event_hooks['response'].append(raise_for_transient_status)
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.max_retries = max_retries
+
+    def _execute(self, query) -> List[Dict]:
+        """Run a query under the shared rate limiter, retrying transient errors. Raises FetchError."""
+        def attempt():
+            self.rate_limiter.acquire()
+            return query.execute()
 
-class AccountFetcher(SupabaseClient):
-    def fetch_batch(self, offset: int = 0, limit: int = 1000) -> List[Dict]:
         try:
-            response = self.client.table('account').select('*').range(offset, offset + limit - 1).execute()
-            return response.data
+            return call_with_retries(attempt, self.max_retries).data
         except Exception as e:
-            logging.error(f"Error fetching accounts batch: {str(e)}")
-            return []
+            logging.error(f"Query failed: {str(e)}")
+            logging.error(f"Query details: {query.params}")  # Log the query details for debugging
+            raise FetchError(str(e)) from e
+
+class AccountFetcher(SupabaseClient):
+    def fetch_batch(self, offset: int = 0, limit: int = 1000) -> List[Dict]:
+        return self._execute(self.client.table('account').select('*').range(offset, offset + limit - 1))
+
+    def fetch_page(self, after: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Fetch the next `limit` accounts with account_id greater than `after` (keyset pagination)."""
+        query = self.client.table('account').select('*').order('account_id').limit(limit)
+        if after is not None:
+            query = query.gt('account_id', after)
+        return self._execute(query)
+
+    def fetch_by_username(self, username: str) -> Optional[Dict]:
+        """The account row for `username`, or None if there is none. Raises FetchError if the lookup fails."""
+        data = self._execute(self.client.table('account').select('*').eq('username', username).limit(1))
+        return data[0] if data else None
+
+    def fetch_all(self, pagination: str = 'offset') -> List[Dict]:
+        if pagination == 'keyset':
+            return self.fetch_all_keyset()
 
-    def fetch_all(self) -> List[Dict]:
         all_accounts = []
         offset = 0
         batch_size = 1000
@@ -45,50 +99,137 @@ class AccountFetcher(SupabaseClient):
             
             if len(batch) < batch_size:
                 break
-            
-            time.sleep(0.1)  # To avoid hitting rate limits
 
         logging.info(f"Total accounts fetched: {len(all_accounts)}")
         return all_accounts
 
+    def fetch_all_keyset(self, batch_size: int = 1000) -> List[Dict]:
+        all_accounts = []
+        after = None
+
+        while True:
+            logging.info(f"Fetching accounts after {after}...")
+            batch = self.fetch_page(after, batch_size)
+
+            if not batch:
+                break
+
+            all_accounts.extend(batch)
+            after = batch[-1]['account_id']
+
+            if len(batch) < batch_size:
+                break
+
+        logging.info(f"Total accounts fetched: {len(all_accounts)}")
+        return all_accounts
+
+def _isoformat(value: Union[str, datetime]) -> str:
+    return value if isinstance(value, str) else value.isoformat()
+
 class TweetFetcher(SupabaseClient):
-    def fetch_batch(self, account_id: Optional[int] = None, offset: int = 0, limit: int = 1000, 
-                    start_date: Optional[datetime] = None, 
-                    end_date: Optional[datetime] = None,
-                    keywords: Optional[List[str]] = None) -> List[Dict]:
-        query = self.client.table('tweets').select('*').order('created_at', desc=True).range(offset, offset + limit - 1)
-        
+    @staticmethod
+    def _projection(columns: Optional[List[str]]) -> List[str]:
+        # Paging and merging always need the keyset columns, whatever the caller asked for
+        if not columns:
+            return ['*']
+        return list(dict.fromkeys(['tweet_id', 'created_at', *columns]))
+
+    def _filtered_query(self, account_id: Optional[int] = None,
+                        start_date: Optional[Union[str, datetime]] = None,
+                        end_date: Optional[Union[str, datetime]] = None,
+                        keywords: Optional[List[str]] = None,
+                        columns: Optional[List[str]] = None):
+        query = self.client.table('tweets').select(*self._projection(columns))
+
         if account_id is not None:
             query = query.eq('account_id', account_id)
         
-        if start_date and end_date:
-            query = query.gte('created_at', start_date.isoformat()).lte('created_at', end_date.isoformat())
+        if start_date:
+            query = query.gte('created_at', _isoformat(start_date))
+        if end_date:
+            query = query.lte('created_at', _isoformat(end_date))
 
         if keywords:
             keyword_string = ' | '.join(keywords)  # Join keywords with OR operator
-            query = query.text_search('full_text', keyword_string)
+            # fts() rather than text_search(): text_search returns a builder that can't be ordered or paged
+            query = query.fts('full_text', keyword_string)
 
-        try:
-            logging.info(f"Making request to fetch tweets")
-            response = query.execute()
-            logging.info(f"Received {len(response.data)} tweets")
-            return response.data
-        except Exception as e:
-            logging.error(f"Error fetching tweets: {str(e)}")
-            logging.error(f"Query details: {query._query}")  # Log the query details for debugging
-            return []
+        return query
+
+    def _execute(self, query) -> List[Dict]:
+        logging.info(f"Making request to fetch tweets")
+        data = super()._execute(query)
+        logging.info(f"Received {len(data)} tweets")
+        return data
+
+    def fetch_batch(self, account_id: Optional[int] = None, offset: int = 0, limit: int = 1000, 
+                    start_date: Optional[datetime] = None, 
+                    end_date: Optional[datetime] = None,
+                    keywords: Optional[List[str]] = None,
+                    columns: Optional[List[str]] = None) -> List[Dict]:
+        query = self._filtered_query(account_id, start_date, end_date, keywords, columns)
+        query = query.order('created_at', desc=True).range(offset, offset + limit - 1)
+        return self._execute(query)
+
+    def fetch_page(self, account_id: Optional[int] = None,
+                   cursor: Optional[Tuple[str, str]] = None, limit: int = 1000,
+                   start_date: Optional[datetime] = None,
+                   end_date: Optional[datetime] = None,
+                   keywords: Optional[List[str]] = None,
+                   descending: bool = True,
+                   columns: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Fetch the next `limit` tweets strictly past `cursor`, a `(created_at, tweet_id)`
+        pair taken from the last tweet of the previous page (keyset pagination). Pages run
+        newest-first by default; `descending=False` walks forward in time from the cursor.
+
+        Unlike OFFSET paging the server seeks straight to the cursor, so every page costs the
+        same however deep the download is, and tweets inserted meanwhile can't shift rows
+        between pages.
+        """
+        query = self._filtered_query(account_id, start_date, end_date, keywords, columns)
+        query = query.order('created_at', desc=descending).order('tweet_id', desc=descending).limit(limit)
+
+        if cursor is not None:
+            created_at, tweet_id = cursor
+            op = 'lt' if descending else 'gt'
+            query = query.or_(f'created_at.{op}."{created_at}",'
+                              f'and(created_at.eq."{created_at}",tweet_id.{op}."{tweet_id}")')
+
+        return self._execute(query)
 
     def fetch_all(self, account_id: Optional[int] = None, 
                   start_date: Optional[Union[str, datetime]] = None, 
                   end_date: Optional[Union[str, datetime]] = None,
-                  keywords: Optional[List[str]] = None) -> List[Dict]:
+                  keywords: Optional[List[str]] = None,
+                  concurrency: int = 1,
+                  pagination: str = 'offset',
+                  report: Optional[FetchReport] = None,
+                  columns: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Fetch every matching tweet. If a page still fails after retries the tweets fetched
+        so far are returned, and `report` (when given) records the error and stays incomplete.
+        """
+        report = report if report is not None else FetchReport(username='')
+        if pagination == 'keyset':
+            if concurrency > 1:
+                logging.info("Keyset pagination is sequential; ignoring concurrency")
+            return self.fetch_all_keyset(account_id, start_date, end_date, keywords, report=report, columns=columns)
+        if concurrency > 1:
+            return self.fetch_all_concurrent(account_id, start_date, end_date, keywords, concurrency,
+                                             report=report, columns=columns)
+
         all_tweets = []
         offset = 0
         batch_size = 1000
    
         while True:
             logging.info(f"Fetching tweets {offset} to {offset + batch_size}...")
-            batch = self.fetch_batch(account_id, offset, batch_size, start_date, end_date, keywords)
+            try:
+                batch = self.fetch_batch(account_id, offset, batch_size, start_date, end_date, keywords, columns)
+            except FetchError as e:
+                return self._incomplete(all_tweets, report, e)
+            report.pages += 1
            
             if not batch:
                 break
@@ -98,56 +239,379 @@ class TweetFetcher(SupabaseClient):
            
             if len(batch) < batch_size:
                 break
-           
-            time.sleep(0.01)  # To avoid hitting rate limits
    
-        logging.info(f"Total tweets fetched: {len(all_tweets)}")
+        return self._complete(all_tweets, report)
+
+    def fetch_all_concurrent(self, account_id: Optional[int] = None,
+                             start_date: Optional[Union[str, datetime]] = None,
+                             end_date: Optional[Union[str, datetime]] = None,
+                             keywords: Optional[List[str]] = None,
+                             concurrency: int = 4,
+                             batch_size: int = 1000,
+                             report: Optional[FetchReport] = None,
+                             columns: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Fetch all pages keeping up to `concurrency` page requests in flight.
+
+        Pages are requested speculatively ahead of the last one received; the first
+        short page marks the end of the data and anything requested past it is dropped.
+        Pages are then stitched back together in offset order, which is `created_at`
+        descending since every page is ordered that way server-side. A page that fails
+        after retries truncates the result to the pages before it.
+        """
+        report = report if report is not None else FetchReport(username='')
+        pages = {}
+        in_flight = {}
+        next_offset = 0
+        end_offset = None
+        error = None
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            def submit():
+                nonlocal next_offset
+                logging.info(f"Fetching tweets {next_offset} to {next_offset + batch_size}...")
+                future = executor.submit(self.fetch_batch, account_id, next_offset, batch_size,
+                                         start_date, end_date, keywords, columns)
+                in_flight[future] = next_offset
+                next_offset += batch_size
+
+            for _ in range(concurrency):
+                submit()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    offset = in_flight.pop(future)
+                    try:
+                        batch = future.result()
+                    except FetchError as e:
+                        error = error or e
+                        last_offset = offset - batch_size
+                    else:
+                        pages[offset] = batch
+                        if len(batch) == batch_size:
+                            continue
+                        last_offset = offset
+                    if end_offset is None or last_offset < end_offset:
+                        end_offset = last_offset
+
+                if end_offset is None:
+                    while len(in_flight) < concurrency:
+                        submit()
+
+        # Offset pages can overlap if rows shift mid-download, so drop repeats
+        all_tweets = []
+        seen = set()
+        for offset in sorted(pages):
+            if offset > end_offset:
+                break
+            report.pages += 1
+            for tweet in pages[offset]:
+                if tweet['tweet_id'] not in seen:
+                    seen.add(tweet['tweet_id'])
+                    all_tweets.append(tweet)
+
+        if error is not None:
+            return self._incomplete(all_tweets, report, error)
+        return self._complete(all_tweets, report)
+
+    def iter_pages(self, account_id: Optional[int] = None,
+                   start_date: Optional[Union[str, datetime]] = None,
+                   end_date: Optional[Union[str, datetime]] = None,
+                   keywords: Optional[List[str]] = None,
+                   batch_size: int = 1000,
+                   cursor: Optional[Tuple[str, str]] = None,
+                   descending: bool = True,
+                   report: Optional[FetchReport] = None,
+                   columns: Optional[List[str]] = None) -> Iterator[List[Dict]]:
+        """
+        Yield keyset pages as they arrive, so callers can work on a page while the next one
+        is requested and only ever hold one page in memory. `report` is updated as it goes.
+        """
+        report = report if report is not None else FetchReport(username='')
+
+        while True:
+            logging.info(f"Fetching tweets after cursor {cursor}...")
+            try:
+                batch = self.fetch_page(account_id, cursor, batch_size, start_date, end_date, keywords, descending,
+                                        columns)
+            except FetchError as e:
+                report.error = str(e)
+                logging.error(f"Fetch stopped after {report.tweets} tweets ({report.pages} pages): {str(e)}")
+                return
+            report.pages += 1
+
+            if not batch:
+                break
+
+            report.tweets += len(batch)
+            yield batch
+            cursor = (batch[-1]['created_at'], batch[-1]['tweet_id'])
+
+            if len(batch) < batch_size:
+                break
+
+        report.complete = True
+
+    def fetch_all_keyset(self, account_id: Optional[int] = None,
+                         start_date: Optional[Union[str, datetime]] = None,
+                         end_date: Optional[Union[str, datetime]] = None,
+                         keywords: Optional[List[str]] = None,
+                         batch_size: int = 1000,
+                         cursor: Optional[Tuple[str, str]] = None,
+                         descending: bool = True,
+                         report: Optional[FetchReport] = None,
+                         columns: Optional[List[str]] = None) -> List[Dict]:
+        report = report if report is not None else FetchReport(username='')
+        all_tweets = []
+        for batch in self.iter_pages(account_id, start_date, end_date, keywords, batch_size, cursor, descending,
+                                     report, columns):
+            all_tweets.extend(batch)
+
+        logging.info(f"Total tweets fetched: {len(all_tweets)} ({report.pages} pages)")
         return all_tweets
 
+    def fetch_to_checkpoint(self, account_id: Optional[int] = None,
+                            start_date: Optional[Union[str, datetime]] = None,
+                            end_date: Optional[Union[str, datetime]] = None,
+                            keywords: Optional[List[str]] = None,
+                            batch_size: int = 1000,
+                            report: Optional[FetchReport] = None,
+                            columns: Optional[List[str]] = None,
+                            restart: bool = False) -> FetchCheckpoint:
+        """
+        Keyset fetch that writes every page to a checkpoint under CHECKPOINT_DIR as it arrives.
+        Calling it again with the same arguments after an interruption picks up after the last
+        saved page instead of starting over. Returns the checkpoint, whose pages the caller
+        reads back (e.g. with iter_batches) and clears when done.
+        """
+        report = report if report is not None else FetchReport(username='')
+        checkpoint = FetchCheckpoint({'account_id': account_id, 'start_date': start_date, 'end_date': end_date,
+                                      'keywords': keywords, 'columns': columns})
+        if restart:
+            checkpoint.clear()
+            checkpoint = FetchCheckpoint(checkpoint.params)
+
+        if not checkpoint.complete:
+            for batch in self.iter_pages(account_id, start_date, end_date, keywords, batch_size,
+                                         checkpoint.cursor, report=report, columns=columns):
+                checkpoint.save_batch(batch, (batch[-1]['created_at'], batch[-1]['tweet_id']))
+            if report.complete:
+                checkpoint.mark_complete()
+        else:
+            report.complete = True
+
+        report.tweets = checkpoint.progress['tweets']
+        logging.info(f"Total tweets fetched: {report.tweets} ({checkpoint.progress['batches']} batches checkpointed)")
+        return checkpoint
+
+    def fetch_all_checkpointed(self, account_id: Optional[int] = None,
+                               start_date: Optional[Union[str, datetime]] = None,
+                               end_date: Optional[Union[str, datetime]] = None,
+                               keywords: Optional[List[str]] = None,
+                               batch_size: int = 1000,
+                               report: Optional[FetchReport] = None,
+                               columns: Optional[List[str]] = None,
+                               restart: bool = False,
+                               keep: bool = False) -> List[Dict]:
+        """
+        fetch_to_checkpoint, returning every tweet fetched. The checkpoint is removed once the
+        fetch completes, unless `keep` is set (the caller then clears it with `clear_checkpoint`).
+        """
+        report = report if report is not None else FetchReport(username='')
+        checkpoint = self.fetch_to_checkpoint(account_id, start_date, end_date, keywords, batch_size,
+                                              report=report, columns=columns, restart=restart)
+        all_tweets = checkpoint.load_all()
+        if report.complete and not keep:
+            checkpoint.clear()
+        return all_tweets
+
+    @staticmethod
+    def clear_checkpoint(account_id: Optional[int] = None,
+                         start_date: Optional[Union[str, datetime]] = None,
+                         end_date: Optional[Union[str, datetime]] = None,
+                         keywords: Optional[List[str]] = None,
+                         columns: Optional[List[str]] = None):
+        FetchCheckpoint({'account_id': account_id, 'start_date': start_date, 'end_date': end_date,
+                         'keywords': keywords, 'columns': columns}).clear()
+
+    @staticmethod
+    def _complete(tweets: List[Dict], report: FetchReport) -> List[Dict]:
+        report.tweets = len(tweets)
+        report.complete = True
+        logging.info(f"Total tweets fetched: {len(tweets)} ({report.pages} pages)")
+        return tweets
+
+    @staticmethod
+    def _incomplete(tweets: List[Dict], report: FetchReport, error: Exception) -> List[Dict]:
+        report.tweets = len(tweets)
+        report.complete = False
+        report.error = str(error)
+        logging.error(f"Fetch stopped after {len(tweets)} tweets ({report.pages} pages): {str(error)}")
+        return tweets
+
 def save_data(data: List[Dict], filename: str):
     filepath = os.path.join(DATA_DIR, filename)
     save_pickle(data, filepath)
     logging.info(f"Data saved to {filepath}")
 
-def fetch_data_main(args):
-    account_fetcher = AccountFetcher()
+def _resolve_account(username: str, directory, report: FetchReport):
+    """
+    The account id for `username`, recorded in `report`. None, with report.error telling an
+    unknown username apart from a failed lookup, if there is no id to fetch with.
+    """
+    try:
+        account_id = directory.get_account_id(username)
+    except FetchError as e:
+        logging.error(f"Could not look up {username}: {str(e)}. Skipping...")
+        report.error = f'account lookup failed: {str(e)}'
+        return None
+    if account_id is None:
+        logging.warning(f"Unknown username: {username}. Skipping...")
+        report.error = 'unknown username'
+        return None
+    report.account_id = account_id
+    return account_id
+
+def fetch_user_tweets(username: str, args, tweet_fetcher: TweetFetcher, directory) -> Tuple[List[Tweet], FetchReport]:
+    report = FetchReport(username=username)
+    account_id = _resolve_account(username, directory, report)
+    if account_id is None:
+        return [], report
+    # Subcommands declare the tweet fields they read; None means every column
+    columns = getattr(args, 'columns', None)
+    if columns:
+        columns = TweetFetcher._projection(columns)
+
+    # Keyword searches run server-side full text search, so they always go to the API
+    if not getattr(args, 'no_store', False) and not args.keywords:
+        # The sync stores whole rows so the store can serve any analysis later; `columns`
+        # is applied when reading them back
+        if getattr(args, 'concurrency', 1) > 1:
+            logging.info("The local store syncs pages sequentially; ignoring concurrency (use --no-store)")
+        store = TweetStore()
+        try:
+            store.sync(account_id, tweet_fetcher, report=report)
+            user_tweets = store.get_tweets(account_id, args.start_date, args.end_date, columns)
+        finally:
+            store.close()
+        report.tweets = len(user_tweets)
+    elif getattr(args, 'checkpoint', False):
+        logging.info(f"Fetching tweets for {username} with checkpointing")
+        rows = tweet_fetcher.fetch_all_checkpointed(account_id, args.start_date, args.end_date, args.keywords,
+                                                    report=report, columns=columns)
+        user_tweets = [Tweet.from_dict(row) for row in rows]
+    else:
+        logging.info(f"Fetching tweets for {username}")
+        rows = tweet_fetcher.fetch_all(account_id, args.start_date, args.end_date, args.keywords,
+                                       getattr(args, 'concurrency', 1), getattr(args, 'pagination', 'offset'),
+                                       report=report, columns=columns)
+        user_tweets = [Tweet.from_dict(row) for row in rows]
+    logging.info(f"Total tweets for user @{username}: {len(user_tweets)}")
+
+    if not user_tweets:
+        logging.warning(f"No tweets found for {username}")
+        return [], report
+
+    # Sort tweets by date in descending order
+    user_tweets.sort(key=lambda t: t.created_ts, reverse=True)
+    logging.info(f"Earliest tweet date for @{username}: {user_tweets[-1].created_at}")
+    logging.info(f"Latest tweet date for @{username}: {user_tweets[0].created_at}")
+
+    return user_tweets, report
+
+def stream_user_tweets(username: str, args, report: Optional[FetchReport] = None,
+                       batch_size: int = 1000) -> Iterator[List[Tweet]]:
+    """
+    Yield a user's tweets in batches of Tweet records as they become available, so analyses
+    can start on the first batch and memory stays bounded by the batch size. Batches come
+    in no particular overall order.
+
+    With the local store, stored tweets are streamed from disk first and the sync's new
+    pages follow as they arrive; otherwise pages stream straight from the API.
+    """
+    report = report if report is not None else FetchReport(username=username)
+    account_id = _resolve_account(username, get_account_directory(), report)
+    if account_id is None:
+        return
+    columns = getattr(args, 'columns', None)
+    if columns:
+        columns = TweetFetcher._projection(columns)
     tweet_fetcher = TweetFetcher()
 
-    # Fetch and save accounts
-    accounts = account_fetcher.fetch_all()
-    if not accounts:
-        logging.warning(f"Error fetching accounts.")
-        return None
+    if not getattr(args, 'no_store', False) and not args.keywords:
+        store = TweetStore()
+        try:
+            yield from store.iter_tweets(account_id, args.start_date, args.end_date, columns, batch_size)
 
-    account_map = {str(account['username']): account['account_id'] for account in accounts}
+            start_ts = to_timestamp(args.start_date) if args.start_date else None
+            end_ts = to_timestamp(args.end_date) if args.end_date else None
+            for page in store.iter_sync(account_id, tweet_fetcher, batch_size, report):
+                batch = [tweet for tweet in map(Tweet.from_dict, page)
+                         if (start_ts is None or tweet.created_ts >= start_ts)
+                         and (end_ts is None or tweet.created_ts <= end_ts)]
+                if batch:
+                    yield batch
+        finally:
+            store.close()
+    else:
+        for page in tweet_fetcher.iter_pages(account_id, args.start_date, args.end_date, args.keywords, batch_size,
+                                             report=report, columns=columns):
+            yield [Tweet.from_dict(row) for row in page]
 
-    tweets_dict = {}
-    # Fetch and save tweets for each username
-    for username in args.usernames:
-        account_id = account_map.get(username)
-        if account_id is None:
-            logging.warning(f"Unknown username: {username}. Skipping...")
-            continue
+def fetch_users(args) -> Tuple[Dict[str, List[Tweet]], List[FetchReport]]:
+    """
+    Fetch several users at once. All workers share one TweetFetcher and therefore one
+    rate limiter, so adding users raises throughput without raising the request rate.
+    """
+    tweet_fetcher = TweetFetcher()
+    directory = get_account_directory()
+    workers = max(1, min(getattr(args, 'user_workers', 4), len(args.usernames)))
 
-        logging.info(f"Fetching tweets for {username}")
-        user_tweets = tweet_fetcher.fetch_all(account_id, args.start_date, args.end_date, args.keywords)
-        logging.info(f"Total tweets for user @{username}: {len(user_tweets)}")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda username: fetch_user_tweets(username, args, tweet_fetcher, directory),
+                                    args.usernames))
 
-        if not user_tweets:
-            logging.warning(f"No tweets found for {username}")
-            continue
+    tweets_dict = {}
+    reports = []
+    for username, (user_tweets, report) in zip(args.usernames, results):
+        reports.append(report)
+        if user_tweets:
+            tweets_dict[username] = user_tweets
+    return tweets_dict, reports
 
-        # Sort tweets by date in descending order
-        user_tweets.sort(key=lambda x: parse(x['created_at']), reverse=True)
-        earliest_tweet = min(user_tweets, key=lambda x: parse(x['created_at']))
-        latest_tweet = max(user_tweets, key=lambda x: parse(x['created_at']))
-        logging.info(f"Earliest tweet date for @{username}: {parse(earliest_tweet['created_at'])}")
-        logging.info(f"Latest tweet date for @{username}: {parse(latest_tweet['created_at'])}")
+def fetch_data_main(args):
+    tweets_dict, reports = fetch_users(args)
 
-        tweets_dict[username] = user_tweets
+    for report in reports:
+        if report.complete:
+            logging.info(f"@{report.username}: {report.tweets} tweets, {report.pages} pages, complete")
+        else:
+            logging.warning(f"@{report.username}: INCOMPLETE, {report.tweets} tweets, {report.pages} pages ({report.error})")
 
     return tweets_dict
 
+def fetch_archive_main(args):
+    """
+    Pull every tweet in the archive into the partitioned Parquet archive (ARCHIVE_DIR). The
+    download is checkpointed page by page, so rerunning after an interruption resumes where
+    it stopped; --restart discards the checkpoint and starts from scratch.
+    """
+    tweet_fetcher = TweetFetcher()
+    report = FetchReport(username='(whole archive)')
+    checkpoint = tweet_fetcher.fetch_to_checkpoint(report=report, restart=getattr(args, 'restart', False))
+
+    if not report.complete:
+        logging.warning(f"Archive fetch interrupted after {report.tweets} tweets ({report.error}). "
+                        f"Run fetch_archive again to resume.")
+        return None
+
+    # Stream the saved pages into the archive, so only one page is in memory at a time
+    written = write_archive(checkpoint.iter_batches())
+    # Only drop the saved pages once the archive is safely written
+    checkpoint.clear()
+    return written
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Fetch account and tweet data for multiple accounts")
@@ -155,5 +619,10 @@ if __name__ == "__main__":
     parser.add_argument("--start_date", help="Start date for tweet fetch (YYYY-MM-DD)")
     parser.add_argument("--end_date", help="End date for tweet fetch (YYYY-MM-DD)")
     parser.add_argument("--keywords", nargs='*', help="Keywords to filter tweets (optional)")
+    parser.add_argument("--concurrency", type=int, default=1, help="With --no-store, number of page requests to keep in flight (default: 1)")
+    parser.add_argument("--pagination", choices=['offset', 'keyset'], default='offset', help="Paging strategy (default: offset)")
+    parser.add_argument("--no-store", action='store_true', help="Bypass the local tweet store and fetch everything from the API")
+    parser.add_argument("--user-workers", type=int, default=4, help="Number of users to fetch in parallel (default: 4)")
+    parser.add_argument("--checkpoint", action='store_true', help="With --no-store, save progress page by page and resume interrupted fetches")
     args = parser.parse_args()
     fetch_data_main(args)
\ No newline at end of file
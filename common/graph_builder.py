@@ -2,151 +2,151 @@
 
 import networkx as nx
 import json
-import pickle
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-
-from .utils import load_pickle, save_pickle
-
-def load_data(filename):
-    return load_pickle(filename)
-
-def build_graph(tweets):
-    G = nx.DiGraph()
-    
-    for tweet in tweets:
-        tweet_id = tweet['tweet_id']
-        reply_to_id = tweet['reply_to_tweet_id']
-        
-        G.add_node(tweet_id, **tweet)  # Add all tweet data as node attributes
-        
-        if reply_to_id:
-            G.add_edge(reply_to_id, tweet_id)
-    
-    return G
-
-from config import TWEET_GRAPH_FILE, OUTPUT_DIR, DATA_DIR
 import os
-
-def save_graph_pickle(G, filename=TWEET_GRAPH_FILE):
-    save_pickle(G, filename)
-    print(f"Graph saved in pickle format to {filename}")
-    print("You can now run the thread explorer with: python main.py visualise_threads")
-
-def save_graph_graphml_with_subgraphs(G, filename=os.path.join(OUTPUT_DIR, 'tweet_graph.graphml')):
-    def convert_to_string(value):
-        if isinstance(value, dict):
-            return json.dumps(value)
-        return str(value)
-
-    root = ET.Element('graphml')
-    root.set('xmlns', 'http://graphml.graphdrawing.org/xmlns')
-    
-    # Add key definitions
-    keys = set()
-    for _, data in G.nodes(data=True):
-        keys.update(data.keys())
-    
-    for key in keys:
-        elem = ET.SubElement(root, 'key')
-        elem.set('id', key)
-        elem.set('for', 'node')
-        elem.set('attr.name', key)
-        elem.set('attr.type', 'string')
-
-    # Create separate graphs for each weakly connected component
-    for i, component in enumerate(nx.weakly_connected_components(G)):
-        subgraph = G.subgraph(component)
-        graph_elem = ET.SubElement(root, 'graph')
-        graph_elem.set('id', f'g{i}')
-        graph_elem.set('edgedefault', 'directed')
-
-        for node, data in subgraph.nodes(data=True):
-            node_elem = ET.SubElement(graph_elem, 'node')
-            node_elem.set('id', str(node))
-            for key, value in data.items():
-                data_elem = ET.SubElement(node_elem, 'data')
-                data_elem.set('key', key)
-                data_elem.text = convert_to_string(value)
-
-        for u, v in subgraph.edges():
-            edge_elem = ET.SubElement(graph_elem, 'edge')
-            edge_elem.set('source', str(u))
-            edge_elem.set('target', str(v))
-
-    # Create a pretty-printed XML string
-    xml_string = minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
-
-    # Save to file
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(xml_string)
-
-    print(f"Graph saved in GraphML format with separate subgraphs to {filename}")
-
-def main(args):
-    print("Starting graph building process...")
-    # Load tweets
-    input_file = args.input if hasattr(args, 'input') and args.input else 'whole_archive_tweets.pkl'
-    tweets = load_data(input_file)
-    print(f"Loaded {len(tweets)} tweets from {input_file}.")
-    
-    # Build graph
-    graph = build_graph(tweets)
-    print(f"Graph built with {graph.number_of_nodes()} nodes and {graph.number_of_edges()} edges.")
-    
-    # Save graph in both formats
-    output_file = args.output if hasattr(args, 'output') and args.output else TWEET_GRAPH_FILE
-    save_graph_pickle(graph, output_file)
-    save_graph_graphml_with_subgraphs(graph)
-    print("Graph building process completed.")
-
-if __name__ == "__main__":
-    main()
-
+import re
+import gzip
 import argparse
-import pickle
-
-def build_graph(tweets):
-    G = nx.DiGraph()
-    
-    for tweet in tweets:
-        tweet_id = tweet['tweet_id']
-        reply_to_id = tweet['reply_to_tweet_id']
-        
-        G.add_node(tweet_id, **tweet)  # Add all tweet data as node attributes
-        
-        if reply_to_id:
-            G.add_edge(reply_to_id, tweet_id)
-    
-    return G
-
-def save_graph(graph, filename):
-    with open(filename, 'wb') as f:
-        pickle.dump(graph, f)
-    print(f"Graph saved to {filename}")
+from xml.sax.saxutils import escape, quoteattr
+
+from config import OUTPUT_DIR, DATA_DIR, TWEETS_FILE, REPLY_FOREST_DIR
+from .utils import load_pickle
+from .archive import archive_exists, load_archive
+from .registry import get_registry
+from .reply_forest import ReplyForest
 
 def load_tweets(filename):
+    if filename == os.path.basename(TWEETS_FILE) and archive_exists():
+        return load_archive()
+
     filepath = os.path.join(DATA_DIR, filename)
     try:
-        with open(filepath, 'rb') as f:
-            tweets = pickle.load(f)
+        tweets = get_registry().get(filepath, lambda: load_pickle(filepath))
         print(f"Loaded {len(tweets)} tweets from {filepath}")
         return tweets
     except FileNotFoundError:
         print(f"Error: File not found: {filepath}")
         return []
 
+def build_forest(tweets):
+    """The reply graph as a compact ReplyForest; see common/reply_forest.py."""
+    return ReplyForest.from_tweets(tweets)
+
+def update_forest(forest, tweets, path=REPLY_FOREST_DIR):
+    """
+    Attach newly fetched tweets to `forest`, loaded from `path`, persisting only a delta.
+    Returns the root nodes of every thread that changed.
+    """
+    roots = forest.extend(tweets)
+    forest.save_delta(path)
+    return roots
+
+# Characters XML 1.0 cannot contain, even escaped
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+def _graphml_value(value):
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    return escape(INVALID_XML_CHARS.sub('', str(value)))
+
+def _graphml_components(G):
+    """(nodes as (id, data), edges as (source, target)) per weakly connected component."""
+    if isinstance(G, ReplyForest):
+        for nodes, data in G.iter_components():
+            members = set(nodes.tolist())
+            ids = [G.tweet_id(node) for node in nodes]
+            edges = [(G.tweet_id(G.parent[node]), tweet_id) for node, tweet_id in zip(nodes, ids)
+                     if int(G.parent[node]) in members]
+            yield zip(ids, (d or {} for d in data)), edges
+    else:
+        for component in nx.weakly_connected_components(G):
+            subgraph = G.subgraph(component)
+            yield subgraph.nodes(data=True), subgraph.edges()
+
+GRAPHML_FILE = os.path.join(OUTPUT_DIR, 'tweet_graph.graphml')
+
+def save_graph_graphml_with_subgraphs(G, filename=GRAPHML_FILE,
+                                      attributes=None, compress=None):
+    """
+    Write G (a ReplyForest or NetworkX DiGraph) as GraphML with one <graph> per weakly
+    connected component. Components are written to disk one at a time, so memory stays
+    bounded by the largest thread. `attributes` limits which node fields are written;
+    `compress` gzips the output (default: when the filename ends in .gz).
+    """
+    compress = filename.endswith('.gz') if compress is None else compress
+
+    if attributes is not None:
+        keys = list(attributes)
+    elif isinstance(G, ReplyForest):
+        keys = ['tweet_id', 'account_id', 'created_at', 'full_text', 'favorite_count', 'retweet_count',
+                'reply_to_tweet_id']
+    else:
+        keys = sorted({key for _, data in G.nodes(data=True) for key in data})
+    data_tags = {key: f'      <data key={quoteattr(key)}>' for key in keys}
+
+    opener = gzip.open if compress else open
+    with opener(filename, 'wt', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        for key in keys:
+            f.write(f'  <key id={quoteattr(key)} for="node" attr.name={quoteattr(key)} attr.type="string"/>\n')
+
+        for i, (nodes, edges) in enumerate(_graphml_components(G)):
+            lines = [f'  <graph id="g{i}" edgedefault="directed">']
+            for node, data in nodes:
+                node_data = [(key, value) for key, value in data.items() if key in data_tags]
+                if not node_data:
+                    lines.append(f'    <node id={quoteattr(str(node))}/>')
+                    continue
+                lines.append(f'    <node id={quoteattr(str(node))}>')
+                lines.extend(f'{data_tags[key]}{_graphml_value(value)}</data>' for key, value in node_data)
+                lines.append('    </node>')
+            lines.extend(f'    <edge source={quoteattr(str(u))} target={quoteattr(str(v))}/>' for u, v in edges)
+            lines.append('  </graph>\n')
+            f.write('\n'.join(lines))
+        f.write('</graphml>\n')
+
+    print(f"Graph saved in GraphML format with separate subgraphs to {filename}")
+
 def main(args):
-    input_file = args.input if args.input else 'whole_archive_tweets.pkl'
-    output_file = args.output if args.output else 'graph.pkl'
+    print("Starting graph building process...")
+    input_file = getattr(args, 'input', None) or os.path.basename(TWEETS_FILE)
+    output_dir = getattr(args, 'output', None) or REPLY_FOREST_DIR
 
     tweets = load_tweets(input_file)
-    graph = build_graph(tweets)
-    save_graph(graph, output_file)
+    if getattr(args, 'update', False) and ReplyForest.exists(output_dir):
+        forest = ReplyForest.load(output_dir)
+        previous_version = forest.version
+        roots = update_forest(forest, tweets, output_dir)
+        print(f"Reply forest at {output_dir} updated; {len(roots)} threads changed.")
+        if getattr(args, 'thread_index', True):
+            # Imported here because thread_explorer itself imports common
+            from thread_explorer.artifacts import save_thread_artifacts
+            save_thread_artifacts(forest, roots, previous_version)
+        return [forest.tweet_id(root) for root in roots]
+
+    forest = build_forest(tweets)
+    print(f"Graph built with {forest.number_of_nodes()} nodes and {forest.number_of_edges()} edges.")
+
+    forest.save(output_dir)
+    print(f"Reply forest saved to {output_dir}")
+    if getattr(args, 'thread_index', True):
+        from thread_explorer.artifacts import save_thread_artifacts
+        save_thread_artifacts(forest)
+
+    if getattr(args, 'export_graphml', True):
+        attributes = getattr(args, 'graphml_attributes', None)
+        save_graph_graphml_with_subgraphs(forest, getattr(args, 'graphml', None) or GRAPHML_FILE,
+                                          attributes=attributes.split(',') if attributes else None)
+    print("You can now run the thread explorer with: python main.py visualise_threads")
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Build graph from tweet data")
-    parser.add_argument("--input", help="Input data filename (default: whole_archive_tweets.pkl)")
-    parser.add_argument("--output", help="Output graph filename (default: graph.pkl)")
+    parser = argparse.ArgumentParser(description="Build the reply graph from tweet data")
+    parser.add_argument("--input", help="Input data filename (default: whole_archive_tweets.pkl, or the Parquet archive if present)")
+    parser.add_argument("--output", help=f"Output directory for the reply forest (default: {REPLY_FOREST_DIR})")
+    parser.add_argument("--update", action='store_true', help="Add the input tweets to the existing forest instead of rebuilding it")
+    parser.add_argument("--no-thread-index", dest='thread_index', action='store_false', help="Skip building the thread index and query posting lists")
+    parser.add_argument("--graphml", help=f"GraphML export file, gzipped if it ends in .gz (default: {GRAPHML_FILE})")
+    parser.add_argument("--no-graphml", dest='export_graphml', action='store_false', help="Skip the GraphML export")
+    parser.add_argument("--graphml-attributes", help="Comma-separated node fields to include in the GraphML export")
     args = parser.parse_args()
     main(args)
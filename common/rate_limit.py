@@ -0,0 +1,77 @@
+# rate_limit.py
+import logging
+import random
+import threading
+import time
+
+import httpx
+from postgrest.exceptions import APIError
+
+# PostgREST codes worth retrying: statement timeout and lost database connections
+TRANSIENT_POSTGREST_CODES = {'57014', 'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003'}
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float = 10.0, capacity: float = 10.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def is_transient_status(status: int) -> bool:
+    """Rate limiting (429) and server or gateway failures (5xx) are worth retrying."""
+    return status == 429 or status >= 500
+
+def raise_for_transient_status(response: httpx.Response):
+    """
+    httpx response hook raising httpx.HTTPStatusError for retryable statuses. postgrest wraps
+    error bodies in APIError without the status, so this lets is_transient see it.
+    """
+    if is_transient_status(response.status_code):
+        response.read()
+        response.raise_for_status()
+
+def is_transient(error: Exception) -> bool:
+    """Classify by HTTP status where known, falling back to the PostgREST code in the body."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return is_transient_status(error.response.status_code)
+    if isinstance(error, APIError):
+        code = str(error.code) if error.code is not None else ''
+        # Bodies that are not JSON carry the status as their code
+        return code in TRANSIENT_POSTGREST_CODES or (code.isdigit() and is_transient_status(int(code)))
+    return False
+
+def call_with_retries(func, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+    """
+    Call `func`, retrying transient failures with full-jitter exponential backoff.
+
+    Non-transient errors, and the last transient one once retries run out, are re-raised.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            logging.warning(f"Transient error ({str(e)}), retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+# Shared by every fetcher in the process so parallel fetches respect one request budget
+default_rate_limiter = TokenBucket()
@@ -0,0 +1,75 @@
+# registry.py
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+def _stat_signature(path: str) -> Tuple:
+    """
+    (inode, mtime_ns, size) of `path`. Raises FileNotFoundError.
+
+    A directory is signed by its own entry only, never by walking it: directory artifacts
+    (the Parquet archive, the reply forest) are swapped in whole or updated by renaming or
+    adding entries, each of which changes the directory's inode or mtime.
+    """
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+class ArtifactRegistry:
+    """
+    Loads each on-disk artifact (tweet pickles, the Parquet archive, the tweet graph, ...)
+    once per process and hands every caller the same object.
+
+    An entry is reused while the path's stat signature is unchanged (see _stat_signature).
+    Cached objects are shared, so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Tuple, Any]] = {}  # key -> (stat, value)
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, path: str, loader: Callable[[], Any], key: Hashable = None) -> Any:
+        """
+        The artifact at `path`, calling `loader()` only if it is not cached or the file changed.
+        `key` distinguishes different views loaded from the same path.
+        """
+        entry_key = (os.path.abspath(path), key)
+        # One lock per artifact: concurrent sessions asking for the same file wait for a single load
+        with self._key_lock(entry_key):
+            signature = _stat_signature(path)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            start = time.time()
+            value = loader()
+            self._entries[entry_key] = (signature, value)
+            logging.info(f"Loaded {path} in {time.time() - start:.2f}s")
+            return value
+
+    def invalidate(self, path: Optional[str] = None):
+        """Drop cached entries for `path`, or everything."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                target = os.path.abspath(path)
+                for entry_key in [k for k in self._entries if k[0] == target]:
+                    del self._entries[entry_key]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ArtifactRegistry:
+    """The registry all loaders share, so a file mapped for one page or command is reused by the rest."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ArtifactRegistry()
+        return _registry
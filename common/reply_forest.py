@@ -0,0 +1,527 @@
+# reply_forest.py
+"""
+Compact reply graph for the whole archive.
+
+Every tweet, and every tweet that is replied to but missing from the archive (a
+placeholder), gets a dense node index. A freshly built forest numbers nodes in tweet id
+order; tweets added later by `extend` are appended, so existing indices never change.
+The structure is four NumPy arrays:
+
+    tweet_ids      int64[n]     tweet id of each node
+    parent         int32[n]     node replied to, or -1 for thread roots
+    child_offsets  int64[n + 1] children of node i are children[child_offsets[i]:child_offsets[i + 1]]
+    children       int32[m]
+
+Tweet fields live in a separate Parquet table with one row per node (placeholders are
+null). On disk the arrays are .npy files opened with mmap and the table is memory-mapped,
+so loading costs little more than opening the files. NetworkX graphs are only built for
+the small subgraphs that are actually drawn, via `to_networkx`.
+
+Updates are stored as numbered delta directories next to the base files and applied
+together on load; their reply edges are inserted into the children arrays, not rebuilt. `save` writes everything back
+as a single base, and `save_delta` does so once more than MAX_DELTAS deltas pile up, so
+loads go back to being memory-mapped.
+"""
+import glob
+import logging
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import REPLY_FOREST_DIR
+from .tweet import Tweet
+
+ATTRIBUTE_SCHEMA = pa.schema([
+    ('tweet_id', pa.string()),
+    ('account_id', pa.string()),
+    ('created_ts', pa.int64()),
+    ('full_text', pa.string()),
+    ('favorite_count', pa.int64()),
+    ('retweet_count', pa.int64()),
+    ('reply_to_tweet_id', pa.string()),
+])
+
+ARRAYS = ('tweet_ids', 'parent', 'child_offsets', 'children')
+ATTRIBUTES_FILE = 'nodes.parquet'
+REVISION_FILE = 'revision'
+DELTA_ARRAYS = ('tweet_ids', 'parent', 'override_nodes', 'override_parents', 'attribute_nodes')
+# Saved deltas beyond this are compacted into the base
+MAX_DELTAS = 8
+
+@dataclass
+class ForestDelta:
+    """
+    One `extend` call: nodes appended from `first_node` on (with their parents), existing
+    nodes given a parent (placeholders whose tweet arrived and turned out to be a reply),
+    and attribute rows for `attribute_nodes` (new nodes and filled-in placeholders).
+    """
+    first_node: int
+    tweet_ids: np.ndarray
+    parent: np.ndarray
+    override_nodes: np.ndarray
+    override_parents: np.ndarray
+    attribute_nodes: np.ndarray
+    attributes: pa.Table
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in DELTA_ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        pq.write_table(self.attributes, os.path.join(path, ATTRIBUTES_FILE))
+        with open(os.path.join(path, 'first_node'), 'w') as f:
+            f.write(str(self.first_node))
+
+    @classmethod
+    def load(cls, path: str) -> 'ForestDelta':
+        with open(os.path.join(path, 'first_node')) as f:
+            first_node = int(f.read())
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy')) for name in DELTA_ARRAYS}
+        return cls(first_node, attributes=pq.read_table(os.path.join(path, ATTRIBUTES_FILE)), **arrays)
+
+def save_arrays(arrays: Dict[str, np.ndarray], path: str):
+    """
+    Save each array as `path/<name>.npy`. Files are written beside the old ones and renamed
+    over them, because loaded forests and posting lists mmap the old files and would see
+    them change underneath if they were overwritten in place.
+    """
+    for name, array in arrays.items():
+        filename = os.path.join(path, f'{name}.npy')
+        with open(filename + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(filename + '.tmp', filename)
+
+def _csr(parent: np.ndarray):
+    """child_offsets and children arrays for a parent array."""
+    has_parent = np.flatnonzero(parent >= 0)
+    order = np.argsort(parent[has_parent], kind='stable')
+    children = has_parent[order].astype(np.int32)
+    counts = np.bincount(parent[has_parent], minlength=len(parent))
+    child_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return child_offsets, children
+
+def _add_children(child_offsets: np.ndarray, children: np.ndarray, parent: np.ndarray, new_children: np.ndarray):
+    """
+    The CSR arrays with `new_children` (nodes whose entry in `parent` was just set) added,
+    equal to _csr(parent). Only the new edges are sorted and placed, with a binary search in
+    their parent's range each; the existing arrays are copied around them, not rebuilt.
+    """
+    new_children = np.asarray(new_children, dtype=np.int64)
+    new_parents = np.asarray(parent[new_children], dtype=np.int64)
+    order = np.lexsort((new_children, new_parents))
+    new_children, new_parents = new_children[order], new_parents[order]
+
+    offsets = np.concatenate((child_offsets, np.full(len(parent) + 1 - len(child_offsets), child_offsets[-1])))
+    positions = np.fromiter((offsets[p] + np.searchsorted(children[offsets[p]:offsets[p + 1]], c)
+                             for p, c in zip(new_parents, new_children)), dtype=np.int64, count=len(new_children))
+    counts = np.bincount(new_parents, minlength=len(parent))
+    offsets = offsets + np.concatenate(([0], np.cumsum(counts)))
+    return offsets, np.insert(np.asarray(children), positions, new_children.astype(np.int32))
+
+class ReplyForest:
+    def __init__(self, tweet_ids: np.ndarray, parent: np.ndarray, child_offsets: np.ndarray,
+                 children: np.ndarray, attributes: Optional[pa.Table] = None, path: Optional[str] = None,
+                 revision: int = 0):
+        self.tweet_ids = tweet_ids
+        self.parent = parent
+        self.child_offsets = child_offsets
+        self.children = children
+        self._attributes = attributes
+        self.path = path
+        self.attribute_row: Optional[np.ndarray] = None  # node -> attribute table row, once nodes were added
+        self._sorted_ids: Optional[np.ndarray] = None
+        self._sorted_nodes: Optional[np.ndarray] = None
+        self._unsaved: List[ForestDelta] = []
+        self.revision = revision  # number of deltas applied since the forest was built
+
+    # --- construction -------------------------------------------------------------
+
+    @classmethod
+    def from_tweets(cls, tweets: Iterable[Union[Tweet, Dict]]) -> 'ReplyForest':
+        """Build the forest; a tweet listed more than once keeps its first occurrence."""
+        tweets = [Tweet.coerce(tweet) for tweet in tweets]
+        ids = np.fromiter((int(t.tweet_id) for t in tweets), dtype=np.int64, count=len(tweets))
+        replies = np.fromiter((int(t.reply_to_tweet_id) if t.reply_to_tweet_id else -1 for t in tweets),
+                              dtype=np.int64, count=len(tweets))
+        ids, first = np.unique(ids, return_index=True)
+        tweets = [tweets[i] for i in first]
+        replies = replies[first]
+
+        # Parents that are not in the archive become placeholder nodes
+        tweet_ids = np.union1d(ids, replies[replies >= 0])
+        node = np.searchsorted(tweet_ids, ids)
+        parent = np.full(len(tweet_ids), -1, dtype=np.int32)
+        has_reply = (replies >= 0) & (replies != ids)
+        parent[node[has_reply]] = np.searchsorted(tweet_ids, replies[has_reply])
+
+        columns = {name: [None] * len(tweet_ids) for name in ATTRIBUTE_SCHEMA.names}
+        columns['tweet_id'] = [str(i) for i in tweet_ids]
+        for position, tweet in zip(node, tweets):
+            columns['account_id'][position] = tweet.account_id
+            columns['created_ts'][position] = tweet.created_ts
+            columns['full_text'][position] = tweet.full_text
+            columns['favorite_count'][position] = tweet.favorite_count
+            columns['retweet_count'][position] = tweet.retweet_count
+            columns['reply_to_tweet_id'][position] = tweet.reply_to_tweet_id
+
+        child_offsets, children = _csr(parent)
+        return cls(tweet_ids, parent, child_offsets, children, pa.table(columns, schema=ATTRIBUTE_SCHEMA))
+
+    @classmethod
+    def from_networkx(cls, G: nx.DiGraph) -> 'ReplyForest':
+        """Convert a reply graph built by the old graph_builder (node attributes are tweet dicts)."""
+        # Nodes without data are parents missing from the archive; they come back as placeholders
+        return cls.from_tweets({**data, 'tweet_id': node} for node, data in G.nodes(data=True)
+                               if data.get('created_at') or data.get('created_ts'))
+
+    # --- persistence --------------------------------------------------------------
+
+    def save(self, path: str = REPLY_FOREST_DIR):
+        """Write the whole forest as a new base, folding in (and removing) any deltas."""
+        os.makedirs(path, exist_ok=True)
+        attributes = self.attributes
+        if self.attribute_row is not None:
+            attributes = attributes.take(pa.array(self.attribute_row))
+        save_arrays({name: np.ascontiguousarray(getattr(self, name)) for name in ARRAYS}, path)
+        filename = os.path.join(path, ATTRIBUTES_FILE)
+        pq.write_table(attributes, filename + '.tmp')
+        os.replace(filename + '.tmp', filename)
+        with open(os.path.join(path, REVISION_FILE), 'w') as f:
+            f.write(str(self.revision))
+        for delta_dir in self._delta_dirs(path):
+            shutil.rmtree(delta_dir)
+        self._unsaved = []
+        logging.info(f"Reply forest with {self.number_of_nodes()} nodes saved to {path}")
+
+    def save_delta(self, path: str = REPLY_FOREST_DIR):
+        """
+        Persist the changes made by `extend` since the last save, without rewriting the base,
+        unless that would leave more than MAX_DELTAS deltas; then the forest is compacted.
+        """
+        if len(self._delta_dirs(path)) + len(self._unsaved) > MAX_DELTAS:
+            self.save(path)
+            return
+        for delta in self._unsaved:
+            delta.save(os.path.join(path, f'delta_{len(self._delta_dirs(path)):06d}'))
+        logging.info(f"Saved {len(self._unsaved)} reply forest update(s) to {path}")
+        self._unsaved = []
+
+    @property
+    def has_unsaved_changes(self) -> bool:
+        """True after extend() until the forest or its deltas are saved."""
+        return bool(self._unsaved)
+
+    @staticmethod
+    def _delta_dirs(path: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(path, 'delta_*')))
+
+    @classmethod
+    def load(cls, path: str = REPLY_FOREST_DIR) -> 'ReplyForest':
+        """
+        Open a saved forest. Arrays are memory-mapped and the attribute table is opened on
+        first use; saved deltas are applied on top, all at once.
+        """
+        arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS]
+        revision = 0
+        if os.path.exists(os.path.join(path, REVISION_FILE)):
+            with open(os.path.join(path, REVISION_FILE)) as f:
+                revision = int(f.read())
+        forest = cls(*arrays, path=path, revision=revision)
+        deltas = [ForestDelta.load(delta_dir) for delta_dir in cls._delta_dirs(path)]
+        if deltas:
+            forest._apply(deltas)
+        return forest
+
+    @staticmethod
+    def exists(path: str = REPLY_FOREST_DIR) -> bool:
+        return all(os.path.exists(os.path.join(path, f'{name}.npy')) for name in ARRAYS)
+
+    # --- updates ------------------------------------------------------------------
+
+    def extend(self, tweets: Iterable[Union[Tweet, Dict]]) -> np.ndarray:
+        """
+        Attach newly fetched tweets to the forest and return the root nodes of every thread
+        they touched. New tweets are appended as nodes; a tweet that was only known as a
+        placeholder parent gets its fields filled in and, if it is itself a reply, is hung
+        under its own parent. Tweets already present are ignored. Sorting, searching and the
+        delta kept for `save_delta` are proportional to the new tweets; the node arrays are
+        copied once to make room for them.
+        """
+        tweets = [Tweet.coerce(tweet) for tweet in tweets]
+        by_id: Dict[int, Tweet] = {}
+        for tweet in tweets:
+            by_id.setdefault(int(tweet.tweet_id), tweet)
+        ids = np.fromiter(by_id, dtype=np.int64, count=len(by_id))
+        existing = self._lookup(ids)
+
+        # Existing nodes are placeholders (to fill in) or tweets we already have (to skip)
+        known = existing >= 0
+        placeholder = np.zeros(len(ids), dtype=bool)
+        if known.any():
+            rows = existing[known] if self.attribute_row is None else self.attribute_row[existing[known]]
+            created = self.attributes.column('created_ts').take(pa.array(rows, type=pa.int64()))
+            placeholder[known] = created.is_null().to_numpy(zero_copy_only=False)
+
+        first_node = len(self)
+        new_ids = list(ids[~known])
+        node_of = {tweet_id: first_node + i for i, tweet_id in enumerate(new_ids)}
+        node_of.update((int(tweet_id), int(node)) for tweet_id, node in zip(ids[known], existing[known]))
+
+        # Parents we have never seen become new placeholder nodes
+        updated = [int(tweet_id) for tweet_id in ids[~known | placeholder]]
+        parents = {}
+        for tweet_id in updated:
+            reply_to = by_id[tweet_id].reply_to_tweet_id
+            if not reply_to or int(reply_to) == tweet_id:
+                continue
+            reply_to = int(reply_to)
+            if reply_to not in node_of:
+                found = int(self._lookup(np.array([reply_to], dtype=np.int64))[0])
+                if found < 0:
+                    found = first_node + len(new_ids)
+                    new_ids.append(reply_to)
+                node_of[reply_to] = found
+            parents[tweet_id] = node_of[reply_to]
+
+        new_parent = np.full(len(new_ids), -1, dtype=np.int32)
+        override_nodes, override_parents = [], []
+        for tweet_id, parent in parents.items():
+            node = node_of[tweet_id]
+            if node >= first_node:
+                new_parent[node - first_node] = parent
+            else:
+                override_nodes.append(node)
+                override_parents.append(parent)
+
+        attribute_nodes = [node_of[tweet_id] for tweet_id in updated]
+        attribute_nodes += [first_node + i for i, tweet_id in enumerate(new_ids) if tweet_id not in by_id]
+        columns = {name: [] for name in ATTRIBUTE_SCHEMA.names}
+        for node in attribute_nodes:
+            tweet_id = new_ids[node - first_node] if node >= first_node else int(self.tweet_ids[node])
+            tweet = by_id.get(tweet_id)
+            columns['tweet_id'].append(str(tweet_id))
+            columns['account_id'].append(tweet.account_id if tweet else None)
+            columns['created_ts'].append(tweet.created_ts if tweet else None)
+            columns['full_text'].append(tweet.full_text if tweet else None)
+            columns['favorite_count'].append(tweet.favorite_count if tweet else None)
+            columns['retweet_count'].append(tweet.retweet_count if tweet else None)
+            columns['reply_to_tweet_id'].append(tweet.reply_to_tweet_id if tweet else None)
+
+        delta = ForestDelta(first_node, np.array(new_ids, dtype=np.int64), new_parent,
+                            np.array(override_nodes, dtype=np.int64), np.array(override_parents, dtype=np.int32),
+                            np.array(attribute_nodes, dtype=np.int64), pa.table(columns, schema=ATTRIBUTE_SCHEMA))
+        self._apply([delta])
+        self._unsaved.append(delta)
+
+        touched = np.concatenate((np.array([node_of[t] for t in updated], dtype=np.int64), delta.override_parents))
+        roots = np.unique([self.root_of(int(node)) for node in touched]).astype(np.int64)
+        logging.info(f"Added {len(delta.tweet_ids)} nodes and filled {len(delta.override_nodes)} placeholders; "
+                     f"{len(roots)} threads affected")
+        return roots
+
+    def _apply(self, deltas: List[ForestDelta]):
+        """
+        Append `deltas` in order. Edges are only ever added (new nodes, and placeholders that
+        turn out to be replies), so the new children are inserted into the CSR arrays and the
+        sorted id view rather than either being rebuilt; the arrays are still copied once.
+        """
+        num_nodes = first_node = len(self)
+        for delta in deltas:
+            if delta.first_node != first_node:
+                raise ValueError(f"Delta starts at node {delta.first_node} but the forest has {first_node} nodes")
+            first_node += len(delta.tweet_ids)
+        if self.attribute_row is None:
+            self.attribute_row = np.arange(len(self), dtype=np.int64)
+
+        self.tweet_ids = np.concatenate([self.tweet_ids] + [delta.tweet_ids for delta in deltas])
+        parent = np.concatenate([self.parent] + [delta.parent for delta in deltas]).astype(np.int32)
+        attribute_row = np.concatenate([self.attribute_row, np.zeros(first_node - num_nodes, dtype=np.int64)])
+        rows = self.attributes.num_rows
+        new_children = []
+        for delta in deltas:
+            parent[delta.override_nodes] = delta.override_parents
+            attribute_row[delta.attribute_nodes] = rows + np.arange(len(delta.attribute_nodes))
+            rows += len(delta.attribute_nodes)
+            new_children += [delta.first_node + np.flatnonzero(delta.parent >= 0), delta.override_nodes]
+        self.parent = parent
+        self.attribute_row = attribute_row
+        self.child_offsets, self.children = _add_children(self.child_offsets, self.children, parent,
+                                                          np.concatenate([np.empty(0, dtype=np.int64)] + new_children))
+        self._attributes = pa.concat_tables([self.attributes] + [delta.attributes for delta in deltas])
+        self.revision += len(deltas)
+
+        if self._sorted_ids is not None:
+            new_nodes = np.arange(num_nodes, first_node, dtype=np.int64)
+            order = np.argsort(self.tweet_ids[num_nodes:], kind='stable')
+            new_ids = self.tweet_ids[num_nodes:][order]
+            positions = np.searchsorted(self._sorted_ids, new_ids)
+            sorted_nodes = np.arange(num_nodes, dtype=np.int64) if self._sorted_nodes is None else self._sorted_nodes
+            self._sorted_ids = np.insert(self._sorted_ids, positions, new_ids)
+            self._sorted_nodes = np.insert(sorted_nodes, positions, new_nodes[order])
+
+    @property
+    def attributes(self) -> pa.Table:
+        if self._attributes is None:
+            self._attributes = pq.read_table(os.path.join(self.path, ATTRIBUTES_FILE), memory_map=True)
+        return self._attributes
+
+    # --- structure ----------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.tweet_ids)
+
+    def number_of_nodes(self) -> int:
+        return len(self.tweet_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.children)
+
+    @property
+    def version(self) -> str:
+        """
+        Changes with every update, including one that only fills in a placeholder's fields,
+        e.g. to key caches of derived data.
+        """
+        return f"{self.number_of_nodes()}-{self.number_of_edges()}-{self.revision}"
+
+    def _lookup(self, tweet_ids: np.ndarray) -> np.ndarray:
+        """Node index of each tweet id, or -1 where the id is not in the forest."""
+        if self._sorted_ids is None:
+            # Built forests are in id order; appended nodes (even once saved) need a sorted view
+            ids = np.asarray(self.tweet_ids)
+            if (ids[1:] > ids[:-1]).all():
+                self._sorted_ids, self._sorted_nodes = self.tweet_ids, None
+            else:
+                self._sorted_nodes = np.argsort(self.tweet_ids, kind='stable')
+                self._sorted_ids = self.tweet_ids[self._sorted_nodes]
+        if len(self._sorted_ids) == 0:
+            return np.full(len(tweet_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, tweet_ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == tweet_ids
+        nodes = positions if self._sorted_nodes is None else self._sorted_nodes[positions]
+        return np.where(found, nodes, -1)
+
+    def index_of(self, tweet_id) -> Optional[int]:
+        index = int(self._lookup(np.array([int(tweet_id)], dtype=np.int64))[0])
+        return index if index >= 0 else None
+
+    def tweet_id(self, index: int) -> str:
+        return str(self.tweet_ids[index])
+
+    def children_of(self, index: int) -> np.ndarray:
+        return self.children[self.child_offsets[index]:self.child_offsets[index + 1]]
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.child_offsets)
+
+    def roots(self) -> np.ndarray:
+        return np.flatnonzero(self.parent < 0)
+
+    def root_of(self, index: int) -> int:
+        while self.parent[index] >= 0:
+            index = int(self.parent[index])
+        return index
+
+    def subtree(self, index: int) -> List[int]:
+        """Node indices of `index` and its descendants, in preorder."""
+        nodes, stack = [], [index]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(int(c) for c in self.children_of(node)[::-1])
+        return nodes
+
+    def component(self, index: int) -> List[int]:
+        """The whole thread containing `index`, root first."""
+        return self.subtree(self.root_of(index))
+
+    def levels(self, roots: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """
+        Nodes grouped by depth, roots first, computed breadth-first over the whole forest or,
+        given `roots`, over just their threads.
+        """
+        levels, frontier = [], self.roots() if roots is None else np.asarray(roots, dtype=np.int64)
+        while frontier.size:
+            levels.append(frontier)
+            starts = self.child_offsets[frontier]
+            counts = self.child_offsets[frontier + 1] - starts
+            total = int(counts.sum())
+            if total == 0:
+                break
+            # Positions of every child of the frontier in `children`, without a Python loop
+            shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            frontier = np.asarray(self.children[shifts + np.arange(total)], dtype=np.int64)
+        return levels
+
+    def root_ids(self) -> np.ndarray:
+        """Root node index of every node's thread."""
+        root = np.arange(len(self), dtype=np.int64)
+        for level in self.levels()[1:]:
+            root[level] = root[self.parent[level]]
+        return root
+
+    # --- attributes ---------------------------------------------------------------
+
+    def node_attributes(self, indices: Iterable[int]) -> List[Optional[Dict]]:
+        """Tweet dicts (as the old graph stored them) for the given nodes; None for placeholders."""
+        rows = np.asarray(list(indices), dtype=np.int64)
+        if self.attribute_row is not None:
+            rows = self.attribute_row[rows]
+        rows = self.attributes.take(pa.array(rows, type=pa.int64())).to_pylist()
+        return [Tweet(row['tweet_id'], sys.intern(row['account_id']), row['created_ts'], row['full_text'],
+                      row['favorite_count'], row['retweet_count'], row['reply_to_tweet_id']).to_dict()
+                if row['created_ts'] is not None else None
+                for row in rows]
+
+    def iter_components(self, batch_size: int = 50_000) -> Iterator[Tuple[np.ndarray, List[Optional[Dict]]]]:
+        """
+        Every thread as (node indices, node_attributes), one at a time. Attributes are read for
+        many threads per table access, so a full pass is linear in the size of the forest.
+        """
+        root = self.root_ids()
+        order = np.argsort(root, kind='stable')
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(root[order])) + 1, [len(order)]))
+
+        first = 0
+        while first < len(bounds) - 1:
+            # Group whole threads until the batch holds about batch_size nodes
+            last = int(np.searchsorted(bounds, bounds[first] + batch_size, 'right')) - 1
+            last = max(last, first + 1)
+            batch = order[bounds[first]:bounds[last]]
+            attributes = self.node_attributes(batch)
+            for start, end in zip(bounds[first:last], bounds[first + 1:last + 1]):
+                offset = bounds[first]
+                yield batch[start - offset:end - offset], attributes[start - offset:end - offset]
+            first = last
+
+    def node_column(self, name: str, indices: np.ndarray) -> pa.Array:
+        """One attribute column (e.g. 'account_id') for the given nodes; null for placeholders."""
+        rows = np.asarray(indices, dtype=np.int64)
+        if self.attribute_row is not None:
+            rows = self.attribute_row[rows]
+        return self.attributes.column(name).take(pa.array(rows, type=pa.int64())).combine_chunks()
+
+    def to_networkx(self, indices: Iterable[int], max_nodes: int = 10_000) -> nx.DiGraph:
+        """
+        A DiGraph over the given nodes, keyed by tweet id with tweet fields as node attributes,
+        holding the reply edges between them. Meant for the handful of threads being shown.
+        """
+        indices = list(indices)
+        if len(indices) > max_nodes:
+            raise ValueError(f"Refusing to build a NetworkX graph of {len(indices)} nodes (max_nodes={max_nodes})")
+
+        G = nx.DiGraph()
+        members = set(indices)
+        for index, data in zip(indices, self.node_attributes(indices)):
+            G.add_node(self.tweet_id(index), **(data or {}))
+        for index in indices:
+            parent = int(self.parent[index])
+            if parent in members:
+                G.add_edge(self.tweet_id(parent), self.tweet_id(index))
+        return G
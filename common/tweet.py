@@ -0,0 +1,72 @@
+# tweet.py
+import sys
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Union
+
+from dateutil.parser import parse
+
+class Tweet:
+    """
+    Compact tweet record. `created_at` is parsed once into integer epoch seconds (UTC) and
+    account ids are interned, so a user's history shares a single id string.
+    """
+
+    __slots__ = ('tweet_id', 'account_id', 'created_ts', 'full_text', 'favorite_count',
+                 'retweet_count', 'reply_to_tweet_id')
+
+    def __init__(self, tweet_id: str, account_id: str, created_ts: int, full_text: Optional[str] = None,
+                 favorite_count: int = 0, retweet_count: int = 0, reply_to_tweet_id: Optional[str] = None):
+        self.tweet_id = tweet_id
+        self.account_id = account_id
+        self.created_ts = created_ts
+        self.full_text = full_text
+        self.favorite_count = favorite_count
+        self.retweet_count = retweet_count
+        self.reply_to_tweet_id = reply_to_tweet_id
+
+    @classmethod
+    def from_dict(cls, row: Dict) -> 'Tweet':
+        created_ts = row.get('created_ts')
+        if created_ts is None:
+            created_ts = to_timestamp(row['created_at'])
+        account_id = row.get('account_id')
+        reply_to = row.get('reply_to_tweet_id')
+        return cls(str(row['tweet_id']),
+                   sys.intern(str(account_id)) if account_id is not None else None,
+                   int(created_ts),
+                   row.get('full_text'),
+                   row.get('favorite_count') or 0,
+                   row.get('retweet_count') or 0,
+                   str(reply_to) if reply_to is not None else None)
+
+    @classmethod
+    def coerce(cls, tweet: Union['Tweet', Dict]) -> 'Tweet':
+        return tweet if isinstance(tweet, cls) else cls.from_dict(tweet)
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_ts, timezone.utc)
+
+    def to_dict(self) -> Dict:
+        return {
+            'tweet_id': self.tweet_id,
+            'account_id': self.account_id,
+            'created_at': self.created_at.isoformat(),
+            'full_text': self.full_text,
+            'favorite_count': self.favorite_count,
+            'retweet_count': self.retweet_count,
+            'reply_to_tweet_id': self.reply_to_tweet_id,
+        }
+
+    def __repr__(self):
+        return f"Tweet({self.tweet_id!r}, account_id={self.account_id!r}, created_at={self.created_at.isoformat()!r})"
+
+def to_timestamp(value: Union[str, date, datetime]) -> int:
+    """Epoch seconds for an ISO string, date or datetime. Naive values are taken as UTC."""
+    if isinstance(value, str):
+        value = parse(value)
+    elif not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
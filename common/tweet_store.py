@@ -0,0 +1,145 @@
+# tweet_store.py
+import json
+import logging
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from config import TWEET_STORE_FILE
+from .tweet import Tweet, to_timestamp
+
+SCHEMA_VERSION = 2
+
+# Tweet fields stored as their own columns so reads can project to just what an analysis needs.
+# Anything else the API returns is kept in the `data` JSON column for completeness.
+COLUMNS = ['tweet_id', 'account_id', 'created_at', 'full_text', 'favorite_count', 'retweet_count',
+           'reply_to_tweet_id']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    full_text TEXT,
+    favorite_count INTEGER,
+    retweet_count INTEGER,
+    reply_to_tweet_id TEXT,
+    created_ts INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweets_account_created ON tweets (account_id, created_ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    tweet_id TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+class TweetStore:
+    """
+    Local SQLite copy of the archive's tweets, kept per account.
+
+    Each account has a high-water mark, the newest `(created_at, tweet_id)` stored for it.
+    `sync` asks the API only for tweets past that mark, so after the first download a
+    refresh is a single short request and reads are served from disk.
+    """
+
+    def __init__(self, filename: str = TWEET_STORE_FILE):
+        self.conn = sqlite3.connect(filename, timeout=30)
+        # The store is a cache of the API, so an old layout is simply dropped and re-synced
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript('DROP TABLE IF EXISTS tweets; DROP TABLE IF EXISTS sync_state;')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def high_water_mark(self, account_id) -> Optional[Tuple[str, str]]:
+        row = self.conn.execute('SELECT created_at, tweet_id FROM sync_state WHERE account_id = ?',
+                                (str(account_id),)).fetchone()
+        return tuple(row) if row else None
+
+    def add_tweets(self, account_id, tweets: List[Dict]):
+        """Insert tweets (duplicates are ignored) and move the account's mark to the newest one."""
+        if not tweets:
+            return
+        rows = []
+        for tweet in tweets:
+            extra = {k: v for k, v in tweet.items() if k not in COLUMNS}
+            rows.append((str(tweet['tweet_id']), str(tweet['account_id']), tweet['created_at'],
+                         tweet.get('full_text'), tweet.get('favorite_count'), tweet.get('retweet_count'),
+                         tweet.get('reply_to_tweet_id'), to_timestamp(tweet['created_at']), json.dumps(extra)))
+        newest = max(rows, key=lambda r: (r[7], r[0]))
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO tweets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            mark = self.high_water_mark(account_id)
+            if mark is None or (to_timestamp(mark[0]), mark[1]) < (newest[7], newest[0]):
+                self.conn.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                                  (str(account_id), newest[2], newest[0], time.time()))
+
+    def iter_sync(self, account_id, tweet_fetcher, batch_size: int = 1000, report=None) -> Iterator[List[Dict]]:
+        """
+        Fetch tweets newer than the account's mark, storing and yielding each page as it lands.
+
+        Pages walk forward in time from the mark and are committed one at a time, so if a sync
+        is cut short the mark still sits on a contiguous prefix and the next sync carries on
+        from there.
+        """
+        mark = self.high_water_mark(account_id)
+        if mark is None:
+            logging.info(f"No local tweets for account {account_id}, fetching full history")
+        else:
+            logging.info(f"Syncing account {account_id} from {mark[0]}")
+
+        for page in tweet_fetcher.iter_pages(account_id, batch_size=batch_size, cursor=mark,
+                                             descending=False, report=report):
+            self.add_tweets(account_id, page)
+            yield page
+
+    def sync(self, account_id, tweet_fetcher, batch_size: int = 1000, report=None) -> int:
+        """
+        Fetch and store tweets newer than the account's mark. Returns the number fetched.
+        Whole rows are synced whatever a caller reads; project with `iter_tweets(columns=...)`.
+        """
+        fetched = sum(len(page) for page in self.iter_sync(account_id, tweet_fetcher, batch_size, report))
+        logging.info(f"Stored {fetched} new tweets for account {account_id}")
+        return fetched
+
+    def iter_tweets(self, account_id,
+                    start_date: Optional[Union[str, date, datetime]] = None,
+                    end_date: Optional[Union[str, date, datetime]] = None,
+                    columns: Optional[List[str]] = None,
+                    batch_size: int = 1000) -> Iterator[List[Tweet]]:
+        """
+        Stored tweets for an account as batches of Tweet records, newest first, optionally
+        limited to a date range. Fields outside `columns` are left at their defaults and never read.
+        """
+        selected = ['tweet_id', 'account_id', 'created_ts'] + [
+            c for c in Tweet.__slots__ if c in COLUMNS and c not in ('tweet_id', 'account_id')
+            and (columns is None or c in columns)]
+        query = f"SELECT {', '.join(selected)} FROM tweets WHERE account_id = ?"
+        params = [str(account_id)]
+        if start_date:
+            query += ' AND created_ts >= ?'
+            params.append(to_timestamp(start_date))
+        if end_date:
+            query += ' AND created_ts <= ?'
+            params.append(to_timestamp(end_date))
+        query += ' ORDER BY created_ts DESC, tweet_id DESC'
+
+        cursor = self.conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [Tweet.from_dict(dict(zip(selected, row))) for row in rows]
+
+    def get_tweets(self, account_id,
+                   start_date: Optional[Union[str, date, datetime]] = None,
+                   end_date: Optional[Union[str, date, datetime]] = None,
+                   columns: Optional[List[str]] = None) -> List[Tweet]:
+        """All of `iter_tweets` in one list."""
+        return [tweet for batch in self.iter_tweets(account_id, start_date, end_date, columns) for tweet in batch]
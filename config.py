@@ -7,8 +7,16 @@ import os
 DATA_DIR = 'data'
 OUTPUT_DIR = 'output'
 TWEET_GRAPH_FILE = os.path.join(DATA_DIR, 'tweet_graph.pkl')
+REPLY_FOREST_DIR = os.path.join(DATA_DIR, 'reply_forest')
+THREAD_INDEX_DIR = os.path.join(DATA_DIR, 'thread_index')
+LAYOUT_CACHE_DIR = os.path.join(DATA_DIR, 'layout_cache')
 ACCOUNTS_FILE = os.path.join(DATA_DIR, 'accounts.pkl')
 TWEETS_FILE = os.path.join(DATA_DIR, 'whole_archive_tweets.pkl')
+ACCOUNT_DIRECTORY_FILE = os.path.join(DATA_DIR, 'account_directory.pkl')
+TWEET_STORE_FILE = os.path.join(DATA_DIR, 'tweet_store.sqlite')
+SCORE_STORE_FILE = os.path.join(DATA_DIR, 'sentiment_scores.sqlite')
+CHECKPOINT_DIR = os.path.join(DATA_DIR, 'checkpoints')
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
 INTERESTING_SUBGRAPHS_FILE = os.path.join(DATA_DIR, 'interesting_subgraphs.pkl')
 
 # NRC Lexicon file path
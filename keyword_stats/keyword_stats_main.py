@@ -5,6 +5,10 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 import nltk
 import logging
+from common.tweet import Tweet
+from common.archive import archive_exists, load_archive
+from common.registry import get_registry
+from config import TWEETS_FILE
 
 # Download necessary NLTK data
 nltk.download('punkt', quiet=True)
@@ -14,10 +18,16 @@ nltk.download('stopwords', quiet=True)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def load_tweets(filename='whole_archive_tweets.pkl'):
+    if filename == os.path.basename(TWEETS_FILE) and archive_exists():
+        return load_archive(columns=['full_text'])
+
     tweets_filepath = os.path.join('data', filename)
-    try:
+    def read():
         with open(tweets_filepath, 'rb') as f:
-            tweets = pickle.load(f)
+            return [Tweet.coerce(tweet) for tweet in pickle.load(f)]
+
+    try:
+        tweets = get_registry().get(tweets_filepath, read, key='tweets')
         logging.info(f"Loaded {len(tweets)} tweets from {tweets_filepath}")
         return tweets
     except FileNotFoundError:
@@ -29,7 +39,7 @@ def calculate_keyword_stats(tweets):
     word_counts = Counter()
 
     for tweet in tweets:
-        words = word_tokenize(tweet['full_text'].lower())
+        words = word_tokenize(tweet.full_text.lower())
         words = [word for word in words if word.isalnum() and word not in stop_words]
         word_counts.update(words)
 
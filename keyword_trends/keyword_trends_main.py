@@ -4,12 +4,15 @@ import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta, date
 import logging
-from dateutil.parser import parse
 from dateutil.tz import tzutc
 import os
 from collections import Counter
 import time
 from functools import wraps
+from common.corpus import TweetCorpus
+from common.archive import archive_exists, load_archive
+from common.registry import get_registry
+from config import TWEETS_FILE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,51 +28,78 @@ def timing_decorator(func):
     return wrapper
 
 @timing_decorator
-def load_tweets(filename='whole_archive_tweets.pkl', accounts_filename='accounts.pkl'):
+def load_tweets(filename='whole_archive_tweets.pkl', account_ids=None, start_date=None, end_date=None, columns=None):
+    # The partitioned archive only reads the requested accounts, months and columns. A pickle
+    # is loaded whole into a TweetCorpus, indexed by account and time for filter_tweets_by_date
+    if filename == os.path.basename(TWEETS_FILE) and archive_exists():
+        return load_archive(account_ids=account_ids, start_date=start_date, end_date=end_date, columns=columns)
+
     tweets_filepath = os.path.join('data', filename)
-    accounts_filepath = os.path.join('data', accounts_filename)
-    
-    with open(tweets_filepath, 'rb') as f:
-        tweets = pickle.load(f)
-    logging.info(f"Loaded {len(tweets)} tweets from {tweets_filepath}")
-    
-    with open(accounts_filepath, 'rb') as f:
-        accounts = pickle.load(f)
-    
-    account_map = {str(account['account_id']): account['username'] for account in accounts}
 
-    for tweet in tweets:
-        tweet['username'] = account_map.get(str(tweet['account_id']), f"Unknown (ID: {tweet['account_id']})")
+    def read():
+        with open(tweets_filepath, 'rb') as f:
+            return TweetCorpus(pickle.load(f))
+
+    # Shared across calls and Streamlit sessions until the file changes
+    tweets = get_registry().get(tweets_filepath, read, key='corpus')
+    logging.info(f"Loaded {len(tweets)} tweets from {tweets_filepath}")
     
     return tweets
 
+def load_account_map(accounts_filename='accounts.pkl'):
+    accounts_filepath = os.path.join('data', accounts_filename)
+
+    def read():
+        with open(accounts_filepath, 'rb') as f:
+            accounts = pickle.load(f)
+        return {str(account['account_id']): account['username'] for account in accounts}
+
+    return get_registry().get(accounts_filepath, read, key='account_map')
+
+def resolve_account_ids(username, account_map=None):
+    account_map = account_map if account_map is not None else load_account_map()
+    return {account_id for account_id, name in account_map.items() if name.lower() == username.lower()}
+
 @timing_decorator
-def filter_tweets_by_date(tweets, start_date, end_date, username=None):
-    filtered_tweets = [
-        tweet for tweet in tweets
-        if start_date <= parse(tweet['created_at']).replace(tzinfo=tzutc()) <= end_date
-        and (username is None or tweet['username'].lower() == username.lower())
-    ]
+def filter_tweets_by_date(tweets, start_date, end_date, username=None, account_map=None):
+    start_ts, end_ts = int(start_date.timestamp()), int(end_date.timestamp())
+    # Resolve the username once rather than comparing names tweet by tweet
+    account_ids = resolve_account_ids(username, account_map) if username is not None else None
+
+    if isinstance(tweets, TweetCorpus):
+        filtered_tweets = tweets.select(start_ts, end_ts, account_ids)
+    else:
+        filtered_tweets = [
+            tweet for tweet in tweets
+            if start_ts <= tweet.created_ts <= end_ts
+            and (account_ids is None or tweet.account_id in account_ids)
+        ]
     
     logging.info(f"Filtered {len(filtered_tweets)} tweets between {start_date} and {end_date}")
     return filtered_tweets
 
 @timing_decorator
 def count_keywords(tweets, keywords):
+    """
+    Daily keyword counts. `tweets` is walked once, so it can be any iterable of Tweets,
+    e.g. itertools.chain.from_iterable over batches from stream_user_tweets.
+    """
     keyword_counts = {keyword: Counter() for keyword in keywords}
-    dates = set()
+    days = set()
 
+    # Bucket by UTC day number and only turn the distinct days into dates at the end
     for tweet in tweets:
-        tweet_date = parse(tweet['created_at']).date()
-        tweet_text = tweet['full_text'].lower()
+        tweet_day = tweet.created_ts // 86400
+        tweet_text = tweet.full_text.lower()
         
-        dates.add(tweet_date)
+        days.add(tweet_day)
         for keyword in keywords:
             if keyword.lower() in tweet_text:
-                keyword_counts[keyword][tweet_date] += 1
+                keyword_counts[keyword][tweet_day] += 1
 
-    dates = sorted(dates)
-    return dates, {k: [v[d] for d in dates] for k, v in keyword_counts.items()}
+    days = sorted(days)
+    dates = [datetime.fromtimestamp(day * 86400, tzutc()).date() for day in days]
+    return dates, {k: [v[d] for d in days] for k, v in keyword_counts.items()}
 
 @timing_decorator
 def plot_keyword_trends(dates, keyword_counts, ma_window=1, username=None, keywords=None):
@@ -102,16 +132,19 @@ def plot_keyword_trends(dates, keyword_counts, ma_window=1, username=None, keywo
 def keyword_trends_main(args, progress_callback=None):
     logging.info("Running Keyword Trends Analysis with args: %s", args)
     
-    all_tweets = load_tweets(args.input) if args.input else load_tweets()
+    end_date = datetime.now(tzutc())
+    start_date = end_date - timedelta(days=args.days)
+    account_map = load_account_map() if args.username else None
+    account_ids = resolve_account_ids(args.username, account_map) if args.username else None
+
+    all_tweets = load_tweets(args.input or os.path.basename(TWEETS_FILE), account_ids=account_ids,
+                             start_date=start_date, end_date=end_date, columns=['created_at', 'full_text'])
     logging.info("Total tweets loaded: %d", len(all_tweets))
     
     if progress_callback:
         progress_callback(0.2)
     
-    end_date = datetime.now(tzutc())
-    start_date = end_date - timedelta(days=args.days)
-    
-    filtered_tweets = filter_tweets_by_date(all_tweets, start_date, end_date, args.username)
+    filtered_tweets = filter_tweets_by_date(all_tweets, start_date, end_date, args.username, account_map)
     logging.info("Tweets within date range: %d", len(filtered_tweets))
     
     if progress_callback:
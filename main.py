@@ -3,14 +3,24 @@ import sys
 
 from common import graph_builder
 
-from common.fetch_data import fetch_data_main
-from user_stats.user_stats_main import user_stats_main
-from sentiment_analysis.mood import sentiment_analysis_main
+from common.fetch_data import fetch_data_main, fetch_archive_main
+from common.account_directory import get_account_directory
+from common.archive import build_archive_main
+from user_stats.user_stats_main import user_stats_main, COLUMNS as USER_STATS_COLUMNS
+from sentiment_analysis.mood import sentiment_analysis_main, COLUMNS as SENTIMENT_COLUMNS
 from keyword_trends.keyword_trends_main import keyword_trends_main
 from keyword_stats.keyword_stats_main import keyword_stats_main
-from thread_explorer import thread_explorer_main
+from thread_explorer import thread_explorer_main, find_threads_main
+from thread_explorer.scoring import METRICS as THREAD_METRICS
 from datetime import datetime
 
+def add_fetch_options(parser):
+    parser.add_argument("--concurrency", type=int, default=1, help="With --no-store, number of page requests to keep in flight (default: 1)")
+    parser.add_argument("--pagination", choices=['offset', 'keyset'], default='offset', help="Paging strategy: offset ranges or (created_at, tweet_id) keyset (default: offset)")
+    parser.add_argument("--no-store", action='store_true', help="Bypass the local tweet store and fetch everything from the API")
+    parser.add_argument("--user-workers", type=int, default=4, help="Number of users to fetch in parallel (default: 4)")
+    parser.add_argument("--checkpoint", action='store_true', help="With --no-store, save progress page by page and resume interrupted fetches")
+
 def main():
     parser = argparse.ArgumentParser(description="Twitter Data Analysis Tool")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
@@ -21,10 +31,54 @@ def main():
     fetch_data_parser.add_argument("--start-date", help="Start date for tweet fetch (YYYY-MM-DD)")
     fetch_data_parser.add_argument("--end-date", help="End date for tweet fetch (YYYY-MM-DD)")
     fetch_data_parser.add_argument("--keywords", nargs='*', help="Keywords to filter tweets (optional)")
+    add_fetch_options(fetch_data_parser)
     
+    # Fetch Archive parser
+    fetch_archive_parser = subparsers.add_parser("fetch_archive", help="Download the whole archive to data/archive, resuming if interrupted")
+    fetch_archive_parser.add_argument("--restart", action='store_true', help="Discard any saved progress and start from scratch")
+
+    # Build Archive parser
+    build_archive_parser = subparsers.add_parser("build_archive", help="Convert a pickled tweet list into the partitioned Parquet archive")
+    build_archive_parser.add_argument("--input", help="Pickled tweets to convert (default: data/whole_archive_tweets.pkl)")
+
+    # Build Graph parser
+    build_graph_parser = subparsers.add_parser("build_graph", help="Build the reply forest used by the thread explorer")
+    build_graph_parser.add_argument("--input", help="Input data filename (default: whole_archive_tweets.pkl, or the Parquet archive if present)")
+    build_graph_parser.add_argument("--output", help="Output directory for the reply forest (default: data/reply_forest)")
+    build_graph_parser.add_argument("--update", action='store_true', help="Add the input tweets to the existing forest instead of rebuilding it")
+    build_graph_parser.add_argument("--no-thread-index", dest='thread_index', action='store_false', help="Skip building the thread index and query posting lists")
+    build_graph_parser.add_argument("--graphml", help="GraphML export file, gzipped if it ends in .gz (default: output/tweet_graph.graphml)")
+    build_graph_parser.add_argument("--no-graphml", dest='export_graphml', action='store_false', help="Skip the GraphML export")
+    build_graph_parser.add_argument("--graphml-attributes", help="Comma-separated node fields to include in the GraphML export")
+
+    # Visualise Threads parser
+    visualise_parser = subparsers.add_parser("visualise_threads", help="Show the most interesting reply threads")
+    visualise_parser.add_argument("--method", default='size', choices=list(dict.fromkeys(['size', 'branching', 'influence', *THREAD_METRICS])), help="How threads are ranked (default: size)")
+    visualise_parser.add_argument("--num-subgraphs", type=int, default=20, help="Number of threads to show (default: 20)")
+    visualise_parser.add_argument("--page", type=int, help="Show only this page of threads (0-based), one full-width plot per thread")
+    visualise_parser.add_argument("--per-page", type=int, default=1, help="Threads per page with --page (default: 1)")
+    visualise_parser.add_argument("--node-budget", type=int, default=2000, help="Maximum tweets drawn per thread; deeper replies are collapsed (default: 2000)")
+    visualise_parser.add_argument("--workers", type=int, help="Processes used to score threads (default: one per CPU)")
+
+    # Find Threads parser
+    find_threads_parser = subparsers.add_parser("find_threads", help="Find threads by participant, keyword and date")
+    find_threads_parser.add_argument("--usernames", nargs='*', help="Only threads where one of these accounts replied or posted")
+    find_threads_parser.add_argument("--keywords", nargs='*', help="Only threads containing all of these keywords")
+    find_threads_parser.add_argument("--start-date", help="Only count tweets from this date on (YYYY-MM-DD)")
+    find_threads_parser.add_argument("--end-date", help="Only count tweets up to this date (YYYY-MM-DD)")
+    find_threads_parser.add_argument("--method", default='size', choices=list(THREAD_METRICS), help="How matching threads are ranked (default: size)")
+    find_threads_parser.add_argument("--limit", type=int, default=20, help="Number of threads to list (default: 20)")
+    find_threads_parser.add_argument("--workers", type=int, help="Processes used to score threads (default: one per CPU)")
+
+    # Refresh Accounts parser
+    subparsers.add_parser("refresh_accounts", help="Reload the cached account directory from the API")
+
     # Fetch Data parser
     fetch_data_parser = subparsers.add_parser("user_stats", help="Calculate user statistics")
     fetch_data_parser.add_argument("usernames", nargs='+', help="Twitter usernames to fetch data for")
+    add_fetch_options(fetch_data_parser)
+    fetch_data_parser.add_argument("--stream", action='store_true', help="Compute stats batch by batch as tweets arrive")
+    fetch_data_parser.set_defaults(start_date=None, end_date=None, keywords=None)
 
     # Sentiment Analysis parser
     sentiment_parser = subparsers.add_parser("sentiment", help="Run sentiment analysis")
@@ -32,6 +86,9 @@ def main():
     sentiment_parser.add_argument("--start-date", type=str, help="Start date for analysis (YYYY-MM-DD)")
     sentiment_parser.add_argument("--end-date", type=str, help="End date for analysis (YYYY-MM-DD)")
     sentiment_parser.add_argument("--ma-window", type=int, default=7, help="Moving average window size (default: 7)")
+    add_fetch_options(sentiment_parser)
+    sentiment_parser.add_argument("--stream", action='store_true', help="Score tweets batch by batch as they arrive")
+    sentiment_parser.set_defaults(keywords=None)
 
 
     # ------ bellow still WIP
@@ -52,22 +109,40 @@ def main():
 
     args = parser.parse_args()
 
-    if args.start_date and args.end_date:
+    if getattr(args, 'start_date', None) and getattr(args, 'end_date', None):
         args.start_date = datetime.strptime(args.start_date, '%Y-%m-%d').replace(hour=0, minute=0, second=0)
         args.end_date = datetime.strptime(args.end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
 
     if args.command == "fetch_data":
         fetch_data_main(args)
 
+    elif args.command == "fetch_archive":
+        fetch_archive_main(args)
+
+    elif args.command == "build_archive":
+        build_archive_main(args)
+
+    elif args.command == "refresh_accounts":
+        accounts = get_account_directory().refresh()
+        print(f"Account directory refreshed with {len(accounts)} accounts.")
+
     elif args.command == "user_stats":
-        tweets_dict = fetch_data_main(args)
-        if tweets_dict:
-            user_stats_main(args, tweets_dict)
+        args.columns = USER_STATS_COLUMNS
+        if args.stream:
+            user_stats_main(args)
+        else:
+            tweets_dict = fetch_data_main(args)
+            if tweets_dict:
+                user_stats_main(args, tweets_dict)
 
     elif args.command == "sentiment":
-        tweets_dict = fetch_data_main(args)
-        if tweets_dict:
-            sentiment_analysis_main(args, tweets_dict)
+        args.columns = SENTIMENT_COLUMNS
+        if args.stream:
+            sentiment_analysis_main(args)
+        else:
+            tweets_dict = fetch_data_main(args)
+            if tweets_dict:
+                sentiment_analysis_main(args, tweets_dict)
     
     elif args.command == "keywords":
         keyword_trends_main(args)
@@ -78,6 +153,8 @@ def main():
         graph_builder.main(args)
     elif args.command == "visualise_threads":
         thread_explorer_main(args)
+    elif args.command == "find_threads":
+        find_threads_main(args)
 
 
     elif args.command == "help":
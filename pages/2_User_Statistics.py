@@ -1,5 +1,5 @@
 import streamlit as st
-from user_stats.user_stats_main import user_stats_main
+from user_stats.user_stats_main import user_stats_main, COLUMNS
 from common.fetch_data import fetch_data_main
 from common.layout import set_page_config, common_layout, display_error
 
@@ -21,7 +21,8 @@ def main():
             'usernames': [username],
             'start_date': None,
             'end_date': None,
-            'keywords': None
+            'keywords': None,
+            'columns': COLUMNS
         })()
 
         with st.spinner('Generating user statistics...'):
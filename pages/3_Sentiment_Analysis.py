@@ -1,6 +1,6 @@
 import streamlit as st
 from datetime import datetime, timedelta, date
-from sentiment_analysis.mood import sentiment_analysis_main
+from sentiment_analysis.mood import sentiment_analysis_main, COLUMNS
 from common.fetch_data import fetch_data_main
 from common.layout import set_page_config, common_layout, display_error, save_plot_as_image, create_download_button
 
@@ -34,7 +34,8 @@ def main():
             'end_date': end_date,
             'usernames': [username],
             'ma_window': int(ma_window),
-            'keywords': None
+            'keywords': None,
+            'columns': COLUMNS
         })()
 
         with st.spinner('Analyzing sentiment...'):
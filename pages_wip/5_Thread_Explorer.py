@@ -1,18 +1,23 @@
 import streamlit as st
 from thread_explorer.thread_explorer_main import thread_explorer_main
-from common.layout import set_page_config, common_layout, display_error
+from common.layout import set_page_config, common_layout, display_error, display_info
 
 def main():
     set_page_config("Thread Explorer", "🧵")
     common_layout("Thread Explorer", "Visualize and analyze tweet threads.")
 
     method = st.selectbox('Select method', ['size', 'branching'])
-    num_subgraphs = st.number_input('Number of subgraphs to display', min_value=1, max_value=20, value=5)
+    num_subgraphs = st.number_input('Number of top threads to page through', min_value=1, max_value=20, value=5)
+    page = st.number_input('Page', min_value=1, max_value=int(num_subgraphs), value=1)
+    node_budget = st.number_input('Maximum tweets per thread', min_value=100, max_value=50000, value=2000)
 
     if st.button('Explore Threads'):
         args = type('Args', (), {
             'method': method, 
-            'num_subgraphs': int(num_subgraphs)
+            'num_subgraphs': int(num_subgraphs),
+            'page': int(page) - 1,
+            'per_page': 1,
+            'node_budget': int(node_budget)
         })()
 
         with st.spinner('Exploring threads...'):
@@ -20,6 +25,10 @@ def main():
 
         if fig:
             st.plotly_chart(fig, use_container_width=True)
+        elif page > 1:
+            # Fewer distinct threads than requested can be found, leaving the last pages empty
+            display_info(f'Page {int(page)} is out of range: fewer than {int(page)} threads were found. '
+                         'Try a lower page number.')
         else:
             display_error('Failed to generate the visualization. Please check the logs for more information.')
 
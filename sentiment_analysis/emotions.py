@@ -0,0 +1,117 @@
+import logging
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config import NRC_LEXICON_FILE
+
+# The pattern nltk's WordPunctTokenizer splits on
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]+')
+
+# Reported as 0 for tweets without any lexicon word
+BASE_EMOTIONS = ['anger', 'fear', 'anticipation', 'trust', 'surprise', 'sadness', 'joy', 'disgust']
+
+def load_nrc_lexicon(file_path=NRC_LEXICON_FILE):
+    emotion_lexicon = {}
+    if os.path.exists(file_path):
+        with open(file_path, 'r') as file:
+            for line in file:
+                word, emotion, value = line.strip().split('\t')
+                if int(value) == 1:
+                    if word not in emotion_lexicon:
+                        emotion_lexicon[word] = []
+                    emotion_lexicon[word].append(emotion)
+    else:
+        logging.warning(f"NRC Lexicon file not found: {file_path}")
+    return emotion_lexicon
+
+class EmotionScorer:
+    """
+    NRC emotion scoring for batches of texts.
+
+    The lexicon is compiled into a vocabulary and a word x category 0/1 matrix, so a batch
+    is tokenized in one pass and its category counts are one bincount per category over
+    the matched tokens. Proportions follow the per-text scoring exactly: each category's
+    share of all category hits, missing (NaN) for categories a text does not hit, and 0
+    for the eight base emotions when a text hits no category at all.
+    """
+
+    def __init__(self, lexicon: Dict[str, List[str]]):
+        self.lexicon = lexicon
+        self.categories = list(dict.fromkeys(emotion for emotions in lexicon.values() for emotion in emotions))
+        self.vocabulary = {word: i for i, word in enumerate(lexicon)}
+        column = {emotion: i for i, emotion in enumerate(self.categories)}
+        self.matrix = np.zeros((len(lexicon), len(self.categories)), dtype=np.int64)
+        for word, emotions in lexicon.items():
+            self.matrix[self.vocabulary[word], [column[emotion] for emotion in emotions]] = 1
+
+    def counts(self, texts: Sequence[str]) -> np.ndarray:
+        """Category hit counts, one row per text and one column per entry of `categories`."""
+        vocabulary = self.vocabulary
+        words, lengths = [], []
+        for text in texts:
+            matched = [i for i in map(vocabulary.get, TOKEN_PATTERN.findall(text.lower())) if i is not None]
+            words.extend(matched)
+            lengths.append(len(matched))
+
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        hits = self.matrix[np.array(words, dtype=np.int64)]
+        counts = np.empty((len(texts), len(self.categories)), dtype=np.int64)
+        for i in range(len(self.categories)):
+            counts[:, i] = np.bincount(rows, weights=hits[:, i], minlength=len(texts))
+        return counts
+
+    def emotions(self, text: str) -> Dict[str, float]:
+        """
+        Proportions for one text, keyed like pandas' value_counts: most hits first, ties
+        in order of first appearance.
+        """
+        hits = Counter(emotion for word in TOKEN_PATTERN.findall(text.lower())
+                       for emotion in self.lexicon.get(word, ()))
+        total = sum(hits.values())
+        if total == 0:
+            return {emotion: 0 for emotion in BASE_EMOTIONS}
+        return {emotion: count / total for emotion, count in sorted(hits.items(), key=lambda item: -item[1])}
+
+    def _column_order(self, texts: Sequence[str], counts: np.ndarray) -> List[str]:
+        # pd.DataFrame over per-text dicts orders columns by first appearance, so follow
+        # the dict key order of the first texts until every column present has been seen
+        present = {self.categories[i] for i in np.flatnonzero(counts.any(axis=0))}
+        if len(texts) and not counts.any(axis=1).all():
+            present.update(BASE_EMOTIONS)
+        order = []
+        for i in range(len(texts)):
+            if len(order) == len(present):
+                break
+            if counts[i].any():
+                keys = self.emotions(texts[i])
+            else:
+                keys = BASE_EMOTIONS
+            order.extend(key for key in keys if key not in order)
+        return order
+
+    def frame(self, texts: Sequence[str], counts: np.ndarray = None) -> pd.DataFrame:
+        """Emotion proportions for `texts` as a DataFrame, equal to one built from emotions() per text."""
+        counts = self.counts(texts) if counts is None else counts
+        total = counts.sum(axis=1)
+        hit = total > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            proportions = np.where(counts > 0, counts / total[:, None], np.nan)
+
+        columns = {}
+        for emotion in self._column_order(texts, counts):
+            if emotion in self.categories:
+                values = proportions[:, self.categories.index(emotion)]
+            else:
+                values = np.full(len(texts), np.nan)
+            if emotion in BASE_EMOTIONS:
+                if not hit.any():
+                    values = np.zeros(len(texts), dtype=np.int64)
+                else:
+                    values = np.where(hit, values, 0.0)
+            columns[emotion] = values
+        return pd.DataFrame(columns, index=pd.RangeIndex(len(texts)))
@@ -1,25 +1,15 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 import logging
-import nltk
-from nltk.tokenize import WordPunctTokenizer
-import os
-from dateutil.parser import parse
 
-import multiprocessing
 import time
-from joblib import Memory
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Set up caching
-cache_dir = '.cache'
-memory = Memory(cache_dir, verbose=0)
-
 from functools import lru_cache, wraps
 
 def timing_decorator(func):
@@ -32,71 +22,82 @@ def timing_decorator(func):
         return result
     return wrapper
 
-# Initialize VADER sentiment analyzer
-sia = SentimentIntensityAnalyzer()
-
-@lru_cache(maxsize=10000)
-def sentiment_analyzer(text):
-    return [{'score': sia.polarity_scores(text)['compound']}]
-
-# Download necessary NLTK data
-nltk.download('punkt', quiet=True)
-
-from config import NRC_LEXICON_FILE
-
-def load_nrc_lexicon(file_path=NRC_LEXICON_FILE):
-    emotion_lexicon = {}
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            for line in file:
-                word, emotion, value = line.strip().split('\t')
-                if int(value) == 1:
-                    if word not in emotion_lexicon:
-                        emotion_lexicon[word] = []
-                    emotion_lexicon[word].append(emotion)
-    else:
-        logging.warning(f"NRC Lexicon file not found: {file_path}")
-    return emotion_lexicon
-
-emotion_lexicon = load_nrc_lexicon()
-
-def analyze_emotions(text):
-    words = pd.Series(WordPunctTokenizer().tokenize(text.lower()))
-    emotions = words.map(emotion_lexicon).explode()
-    emotion_counts = emotions.value_counts()
-    total = emotion_counts.sum()
-    
-    if total > 0:
-        return emotion_counts.div(total).to_dict()
-    else:
-        return {emotion: 0 for emotion in ['anger', 'fear', 'anticipation', 'trust', 'surprise', 'sadness', 'joy', 'disgust']}
-
-def process_single_tweet(tweet):
-    sentiment = sentiment_analyzer(tweet['full_text'])[0]['score']
-    emotions = analyze_emotions(tweet['full_text'])
-    
-    # Handle both string and Timestamp types for created_at
-    if isinstance(tweet['created_at'], str):
-        created_at = parse(tweet['created_at'])
-    else:
-        created_at = tweet['created_at']
-    
-    return {
-        'created_at': created_at,
-        'sentiment': sentiment,
-        **emotions
-    }
+from common.fetch_data import stream_user_tweets
+from .emotions import EmotionScorer, load_nrc_lexicon
+from .scoring_pool import get_scoring_pool
+from .score_store import ScoreStore, scorer_version
+
+# Tweet fields read by score_tweets; the fetcher only downloads these
+COLUMNS = ['full_text', 'created_at']
+
+@lru_cache(maxsize=None)
+def get_emotion_scorer():
+    """
+    The NRC scorer for naming and ordering emotion columns and versioning stored scores.
+    Built on first use; VADER and the scoring itself live in the scoring pool's workers.
+    """
+    emotion_scorer = EmotionScorer(load_nrc_lexicon())
+    return emotion_scorer, scorer_version(emotion_scorer)
+
+def score_tweets(tweets, pool=None):
+    """
+    VADER sentiment and NRC emotion proportions per tweet, in one DataFrame. Scores already
+    in the score store are read back; only unseen tweets have their texts sent to the shared
+    scoring pool, and their scores are stored for next time.
+    """
+    emotion_scorer, emotion_scorer_version = get_emotion_scorer()
+    texts = [tweet.full_text for tweet in tweets]
+    tweet_ids = [str(tweet.tweet_id) for tweet in tweets]
+
+    with ScoreStore() as store:
+        found, sentiments, counts = store.get(tweet_ids, emotion_scorer_version, len(emotion_scorer.categories))
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            new_sentiments, new_counts = (pool or get_scoring_pool()).score([texts[i] for i in missing])
+            sentiments[missing], counts[missing] = new_sentiments, new_counts
+            store.put([tweet_ids[i] for i in missing], emotion_scorer_version, new_sentiments, new_counts)
+    logging.info(f"Scored {len(missing)} new tweets, read {len(tweets) - len(missing)} from the score store")
+
+    df = pd.DataFrame({
+        'created_at': [tweet.created_at for tweet in tweets],
+        'sentiment': sentiments,
+    })
+    return pd.concat([df, emotion_scorer.frame(texts, counts)], axis=1)
 
 @timing_decorator
 def process_tweets(tweets):
-    with multiprocessing.Pool() as pool:
-        data = pool.map(process_single_tweet, tweets)
-    
-    return pd.DataFrame(data)
-
-@memory.cache
-def cached_process_tweets(tweets):
-    return process_tweets(tweets)
+    return score_tweets(tweets)
+
+def process_tweet_batches(batches):
+    """Score each incoming batch on the shared pool, yielding a DataFrame per batch."""
+    for batch in batches:
+        yield score_tweets(batch)
+
+class DailyMoodAccumulator:
+    """
+    Running per-day sums and non-NaN counts of tweet scores. `result` gives the same daily
+    means as `aggregate_mood` over all the tweets, without ever holding them all at once.
+    """
+
+    def __init__(self):
+        self.sums = None
+        self.counts = None
+        self.total = 0
+
+    def update(self, df):
+        if df.empty:
+            return
+        self.total += len(df)
+        daily = df.set_index('created_at').resample('D')
+        sums, counts = daily.sum(), daily.count()
+        self.sums = sums if self.sums is None else self.sums.add(sums, fill_value=0)
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0)
+
+    def result(self):
+        if self.sums is None:
+            return pd.DataFrame()
+        # Days with no scores divide 0 by 0 and come out NaN, as with resample().mean()
+        return (self.sums / self.counts).asfreq('D')
 
 @timing_decorator
 def aggregate_mood(df, freq='D'):
@@ -220,14 +221,25 @@ def plot_mood_meter(mood_data, ma_window=1, username=None, start_date=None, end_
     return fig
 
 @timing_decorator
-def sentiment_analysis_main(args, tweets_dict, selected_emotions=None):
+def sentiment_analysis_main(args, tweets_dict=None, selected_emotions=None):
+    """
+    Without `tweets_dict` the user's tweets are streamed and scored batch by batch, with
+    daily aggregates folded in as each batch arrives.
+    """
     logging.info("Running Sentiment Analysis with args: %s", args)
     logging.info("Selected emotions: %s", selected_emotions)  
 
-    user_tweets = tweets_dict[args.usernames[0]] #hardcode just one username for now
-    
-    df = cached_process_tweets(tuple(user_tweets))  # Convert list to tuple for caching
-    daily_mood = aggregate_mood(df, freq='D')
+    if tweets_dict is None:
+        accumulator = DailyMoodAccumulator()
+        for df in process_tweet_batches(stream_user_tweets(args.usernames[0], args)):
+            accumulator.update(df)
+            logging.info(f"Scored {accumulator.total} tweets for @{args.usernames[0]}")
+        daily_mood = accumulator.result()
+    else:
+        user_tweets = tweets_dict[args.usernames[0]] #hardcode just one username for now
+
+        df = process_tweets(user_tweets)
+        daily_mood = aggregate_mood(df, freq='D')
     daily_mood = daily_mood.dropna()  # Remove rows with NaN values
     
     if daily_mood.empty:
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import sqlite3
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from config import SCORE_STORE_FILE
+from .emotions import EmotionScorer
+
+# Bump when VADER or NRC scoring changes in a way the lexicon digest does not capture
+SCORER_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    tweet_id TEXT NOT NULL,
+    scorer_version TEXT NOT NULL,
+    compound REAL NOT NULL,
+    counts BLOB NOT NULL,
+    PRIMARY KEY (tweet_id, scorer_version)
+) WITHOUT ROWID;
+"""
+
+def scorer_version(emotion_scorer: EmotionScorer) -> str:
+    """SCORER_VERSION plus a digest of the lexicon, so editing the lexicon file retires old scores."""
+    digest = hashlib.sha1(repr((emotion_scorer.categories, sorted(emotion_scorer.lexicon.items()))).encode())
+    return f"{SCORER_VERSION}-{digest.hexdigest()[:12]}"
+
+class ScoreStore:
+    """
+    Per-tweet sentiment scores in SQLite, keyed by tweet_id and scorer version.
+
+    A row holds the VADER compound score and the NRC category counts (every lexicon
+    category, in EmotionScorer.categories order, as int32 bytes), from which the emotion
+    proportions are rebuilt exactly. Scores never change for a given tweet and version,
+    so an analysis only scores the tweets it has not seen before.
+    """
+
+    def __init__(self, filename: str = SCORE_STORE_FILE):
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(filename, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, tweet_ids: Sequence[str], version: str, num_categories: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(found mask, compound scores, category counts) for `tweet_ids`, in order."""
+        found = np.zeros(len(tweet_ids), dtype=bool)
+        compound = np.zeros(len(tweet_ids), dtype=np.float64)
+        counts = np.zeros((len(tweet_ids), num_categories), dtype=np.int32)
+        if not len(tweet_ids):
+            return found, compound, counts
+
+        # Join against a temporary table instead of building huge IN (...) lists. Filling it
+        # opens a transaction, which must end here so no read lock outlives the call
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (position INTEGER PRIMARY KEY, tweet_id TEXT)')
+            self.conn.execute('DELETE FROM wanted')
+            self.conn.executemany('INSERT INTO wanted VALUES (?, ?)', enumerate(map(str, tweet_ids)))
+            rows = self.conn.execute(
+                'SELECT wanted.position, scores.compound, scores.counts FROM wanted '
+                'JOIN scores ON scores.tweet_id = wanted.tweet_id AND scores.scorer_version = ?', (version,))
+            for position, score, blob in rows:
+                found[position] = True
+                compound[position] = score
+                counts[position] = np.frombuffer(blob, dtype=np.int32)
+            self.conn.execute('DELETE FROM wanted')
+        return found, compound, counts
+
+    def put(self, tweet_ids: Sequence[str], version: str, compound: np.ndarray, counts: np.ndarray):
+        counts = np.ascontiguousarray(counts, dtype=np.int32)
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)',
+                ((str(tweet_id), version, float(score), row.tobytes())
+                 for tweet_id, score, row in zip(tweet_ids, compound, counts)))
@@ -0,0 +1,97 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from .emotions import EmotionScorer, load_nrc_lexicon
+
+DEFAULT_CHUNK_SIZE = 2000
+# Scoring costs about 0.1ms per text and a pool round trip a few ms, so chunks smaller than
+# this are not worth sending to a worker
+MIN_CHUNK_SIZE = 250
+
+# Per-process scorers, built once by the pool initializer (or on first inline use)
+_analyzer = None
+_emotion_scorer = None
+
+def _init_worker():
+    global _analyzer, _emotion_scorer
+    _analyzer = SentimentIntensityAnalyzer()
+    _emotion_scorer = EmotionScorer(load_nrc_lexicon())
+
+def _score_chunk(chunk: Tuple[int, Sequence[str]]) -> Tuple[int, np.ndarray, np.ndarray]:
+    """(offset, texts) -> (offset, VADER compound per text, NRC category counts per text)."""
+    if _analyzer is None:
+        _init_worker()
+    offset, texts = chunk
+    sentiments = np.fromiter((_analyzer.polarity_scores(text)['compound'] for text in texts),
+                             dtype=np.float64, count=len(texts))
+    return offset, sentiments, _emotion_scorer.counts(texts).astype(np.int32)
+
+class ScoringPool:
+    """
+    Long-lived worker processes for VADER and NRC scoring.
+
+    Workers load VADER and the lexicon once when they start. Texts go out in chunks of up
+    to `chunk_size`, and each chunk comes back as two arrays, so little is pickled per tweet.
+    A batch is split so every worker gets a share, down to MIN_CHUNK_SIZE texts per chunk;
+    batches of MIN_CHUNK_SIZE texts or fewer are scored in this process, since a round trip
+    would cost more than it saves.
+    """
+
+    def __init__(self, processes: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker)
+                logging.info(f"Started sentiment scoring pool with {self.processes or os.cpu_count()} workers")
+            return self._pool
+
+    def score(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """VADER compound scores and NRC category counts (columns as EmotionScorer.categories)."""
+        texts = list(texts)
+        # Spread streamed batches (typically 1000 tweets) over the workers instead of one chunk
+        per_worker = -(-len(texts) // (self.processes or os.cpu_count() or 1))
+        chunk_size = min(self.chunk_size, max(MIN_CHUNK_SIZE, per_worker))
+        chunks = [(i, texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+        if len(chunks) <= 1:
+            _, sentiments, counts = _score_chunk((0, texts))
+            return sentiments, counts
+
+        sentiments = np.empty(len(texts), dtype=np.float64)
+        counts = None
+        for offset, chunk_sentiments, chunk_counts in self._get_pool().imap_unordered(_score_chunk, chunks):
+            if counts is None:
+                counts = np.empty((len(texts), chunk_counts.shape[1]), dtype=np.int32)
+            sentiments[offset:offset + len(chunk_sentiments)] = chunk_sentiments
+            counts[offset:offset + len(chunk_counts)] = chunk_counts
+        return sentiments, counts
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+_scoring_pool = None
+_scoring_pool_lock = threading.Lock()
+
+def get_scoring_pool() -> ScoringPool:
+    """The shared pool, so workers load VADER and the lexicon once rather than per analysis; closed at exit."""
+    global _scoring_pool
+    with _scoring_pool_lock:
+        if _scoring_pool is None:
+            _scoring_pool = ScoringPool()
+            atexit.register(_scoring_pool.close)
+        return _scoring_pool
@@ -0,0 +1,62 @@
+"""EmotionScorer against the per-tweet pandas scoring it replaced."""
+import pandas as pd
+import pytest
+from nltk.tokenize import WordPunctTokenizer
+
+from sentiment_analysis.emotions import BASE_EMOTIONS, EmotionScorer
+
+LEXICON = {
+    'happy': ['joy', 'positive', 'trust'],
+    'love': ['joy', 'positive'],
+    'angry': ['anger', 'negative'],
+    'afraid': ['fear', 'negative'],
+    'wow': ['surprise', 'anticipation'],
+    'wait': ['anticipation'],
+    'sad': ['sadness', 'negative'],
+    'gross': ['disgust', 'negative'],
+    'don': ['sadness'],
+}
+
+TEXTS = [
+    'I am so happy, I love it!',
+    'Angry... and AFRAID?!',
+    'nothing to see here',
+    '',
+    "Don't wait: wow, wow, wow",
+    'sad sad happy gross',
+    '!!! ???',
+    'love',
+]
+
+def old_analyze(text, emotion_lexicon=LEXICON):
+    """Per-tweet scoring as sentiment_analysis/mood.py did it before EmotionScorer."""
+    words = pd.Series(WordPunctTokenizer().tokenize(text.lower()))
+    emotions = words.map(emotion_lexicon).explode()
+    emotion_counts = emotions.value_counts()
+    total = emotion_counts.sum()
+    if total > 0:
+        return emotion_counts.div(total).to_dict()
+    else:
+        return {emotion: 0 for emotion in BASE_EMOTIONS}
+
+@pytest.fixture
+def scorer():
+    return EmotionScorer(LEXICON)
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_emotions_match_old_scoring_and_key_order(scorer, text):
+    assert list(scorer.emotions(text).items()) == list(old_analyze(text).items())
+
+@pytest.mark.parametrize('texts', [TEXTS, TEXTS[::-1], TEXTS[2:4] + TEXTS[:2]])
+def test_frame_matches_old_frame(scorer, texts):
+    expected = pd.DataFrame([old_analyze(text) for text in texts])
+    actual = scorer.frame(texts)
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+def test_frame_without_hits_matches_old_frame_exactly(scorer):
+    texts = ['nothing to see here', '', '!!! ???']
+    pd.testing.assert_frame_equal(scorer.frame(texts), pd.DataFrame([old_analyze(text) for text in texts]))
+
+def test_frame_from_precomputed_counts(scorer):
+    pd.testing.assert_frame_equal(scorer.frame(TEXTS, counts=scorer.counts(TEXTS)), scorer.frame(TEXTS))
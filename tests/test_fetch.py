@@ -0,0 +1,76 @@
+"""Keyset paging and checkpoint resume in TweetFetcher, against the local PostgREST stand-in."""
+from itertools import islice
+
+import httpx
+import pytest
+
+from common.backends import LocalPostgrestTransport, synthetic_tables
+from common.fetch_data import FetchReport, TweetFetcher
+from common.rate_limit import TokenBucket
+
+ACCOUNT_ID = '1000'
+
+def tied_tweets():
+    """Twelve tweets sharing four timestamps, so every page boundary below falls inside a tie."""
+    return [{'tweet_id': str(10 ** 17 + i), 'account_id': ACCOUNT_ID,
+             'created_at': f'2024-01-0{1 + i // 3}T12:00:00+00:00', 'full_text': f'tweet {i}',
+             'favorite_count': 0, 'retweet_count': 0, 'reply_to_tweet_id': None}
+            for i in range(12)]
+
+class FailingTransport(LocalPostgrestTransport):
+    """Answers every request after the first `healthy` with 503, like an outage mid-download."""
+
+    def __init__(self, tables, healthy: int):
+        super().__init__(tables)
+        self.healthy = healthy
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.requests >= self.healthy:
+            self.requests += 1
+            return httpx.Response(503, json={'message': 'Service unavailable'})
+        return super().handle_request(request)
+
+def fetcher(transport) -> TweetFetcher:
+    return TweetFetcher(url='http://localhost', key='test', backend=transport, max_retries=0,
+                        rate_limiter=TokenBucket(rate=1000, capacity=1000))
+
+def ids(tweets):
+    return [tweet['tweet_id'] for tweet in tweets]
+
+@pytest.mark.parametrize('batch_size', [1, 2, 3, 4, 5])
+@pytest.mark.parametrize('descending', [True, False])
+def test_keyset_pages_cross_timestamp_ties_without_gaps_or_repeats(batch_size, descending):
+    tweets = tied_tweets()
+    report = FetchReport(username='test')
+    pages = fetcher(LocalPostgrestTransport({'tweets': tweets})).iter_pages(
+        ACCOUNT_ID, batch_size=batch_size, descending=descending, report=report)
+    # A cursor that fails to move past a tie would page forever, so stop at one page per tweet
+    fetched = [tweet for page in islice(pages, len(tweets)) for tweet in page]
+    assert ids(fetched) == sorted(ids(tweets), reverse=descending)
+    assert report.tweets == len(tweets)
+
+def test_keyset_cursor_on_a_tie_excludes_only_the_tweets_before_it():
+    tweets = tied_tweets()
+    cursor = (tweets[4]['created_at'], tweets[4]['tweet_id'])
+    client = fetcher(LocalPostgrestTransport({'tweets': tweets}))
+    assert ids(client.fetch_page(ACCOUNT_ID, cursor, limit=100)) == ids(tweets[3::-1])
+    assert ids(client.fetch_page(ACCOUNT_ID, cursor, limit=100, descending=False)) == ids(tweets[5:])
+
+def test_checkpointed_fetch_resumes_after_the_last_saved_page(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # checkpoints live under the relative CHECKPOINT_DIR
+    tweets = synthetic_tables(accounts=1, tweets_per_account=50)['tweets']
+
+    report = FetchReport(username='test')
+    checkpoint = fetcher(FailingTransport({'tweets': tweets}, healthy=3)).fetch_to_checkpoint(
+        ACCOUNT_ID, batch_size=10, report=report)
+    assert not report.complete and report.error
+    assert checkpoint.progress['batches'] == 3 and not checkpoint.complete
+
+    transport = LocalPostgrestTransport({'tweets': tweets})
+    report = FetchReport(username='test')
+    fetched = fetcher(transport).fetch_all_checkpointed(ACCOUNT_ID, batch_size=10, report=report)
+    assert report.complete and report.tweets == len(tweets)
+    assert ids(fetched) == sorted(ids(tweets), reverse=True)
+    # Only the two remaining pages and the empty one that ends the walk were requested
+    assert transport.requests == 3
+    assert not (tmp_path / checkpoint.path).exists()
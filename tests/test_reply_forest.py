@@ -0,0 +1,67 @@
+"""ReplyForest updates (extend, saved deltas, compaction) against building from scratch."""
+import random
+
+import numpy as np
+import pytest
+
+import common.reply_forest as reply_forest
+from common.backends import synthetic_tables
+from common.reply_forest import ReplyForest, _csr
+
+@pytest.fixture(scope='module')
+def tweets():
+    # Shuffled, so replies often arrive before their parents and fill in placeholders later
+    rows = synthetic_tables(accounts=5, tweets_per_account=400, reply_fraction=0.6)['tweets']
+    random.Random(1).shuffle(rows)
+    return rows
+
+def chunks(rows, size):
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+def snapshot(forest: ReplyForest):
+    """The forest by tweet id, independent of node numbering: parent ids, children ids and attributes."""
+    ids = [forest.tweet_id(node) for node in range(len(forest))]
+    parents = {ids[node]: ids[p] if p >= 0 else None for node, p in enumerate(forest.parent.tolist())}
+    children = {ids[node]: sorted(ids[c] for c in forest.children_of(node)) for node in range(len(forest))}
+    attributes = dict(zip(ids, forest.node_attributes(range(len(forest)))))
+    return parents, children, attributes
+
+def assert_same_forest(forest: ReplyForest, expected: ReplyForest):
+    assert forest.number_of_nodes() == expected.number_of_nodes()
+    assert forest.number_of_edges() == expected.number_of_edges()
+    assert snapshot(forest) == snapshot(expected)
+    # Children inserted edge by edge must match the CSR built from the parent array
+    child_offsets, children = _csr(np.asarray(forest.parent))
+    assert np.array_equal(forest.child_offsets, child_offsets)
+    assert np.array_equal(forest.children, children)
+
+def test_extend_matches_full_build(tweets):
+    forest = ReplyForest.from_tweets(tweets[:500])
+    for chunk in chunks(tweets[500:], 300):
+        forest.extend(chunk)
+    assert_same_forest(forest, ReplyForest.from_tweets(tweets))
+
+def test_saved_deltas_and_compaction_match_full_build(tweets, tmp_path, monkeypatch):
+    monkeypatch.setattr(reply_forest, 'MAX_DELTAS', 2)
+    path = str(tmp_path / 'forest')
+    ReplyForest.from_tweets(tweets[:500]).save(path)
+    for end in range(700, len(tweets) + 1, 200):
+        forest = ReplyForest.load(path)
+        forest.extend(tweets[end - 200:end])
+        forest.save_delta(path)
+        assert len(ReplyForest._delta_dirs(path)) <= 2
+        assert_same_forest(ReplyForest.load(path), ReplyForest.from_tweets(tweets[:end]))
+
+def test_version_changes_when_only_a_placeholder_is_filled(tmp_path):
+    parent = {'tweet_id': '1', 'account_id': '1000', 'created_at': '2024-01-01T00:00:00+00:00',
+              'full_text': 'parent', 'favorite_count': 0, 'retweet_count': 0, 'reply_to_tweet_id': None}
+    reply = {**parent, 'tweet_id': '2', 'full_text': 'reply', 'reply_to_tweet_id': '1'}
+    path = str(tmp_path / 'forest')
+    ReplyForest.from_tweets([reply]).save(path)
+
+    forest = ReplyForest.load(path)
+    version = forest.version
+    forest.extend([parent])
+    forest.save_delta(path)
+    assert forest.number_of_nodes() == 2 and forest.number_of_edges() == 1
+    assert ReplyForest.load(path).version == forest.version != version
@@ -1,3 +1,4 @@
 from .thread_explorer_main import thread_explorer_main
 from .subgraph_utils import load_data, find_interesting_subgraphs, get_unique_subgraphs
 from .visualize import visualize_subgraphs
+from .thread_query import find_threads_main, query_threads
@@ -0,0 +1,29 @@
+import os
+from typing import Iterable, Optional
+
+from common.reply_forest import ReplyForest
+from .thread_index import save_thread_index, update_thread_index
+from .thread_query import POSTINGS_DIR, ThreadPostings
+
+def save_thread_artifacts(forest: ReplyForest, roots: Optional[Iterable[int]] = None,
+                          previous_version: Optional[str] = None):
+    """
+    Write the thread index and query posting lists for `forest`. With `roots` (node
+    indices of the threads ReplyForest.extend changed), only those threads are recomputed,
+    and both are saved as deltas. Posting lists saved for the forest as it was
+    (`previous_version`) are extended with the new tweets instead of being rebuilt.
+    """
+    if roots is None:
+        save_thread_index(forest)
+        ThreadPostings.build(forest).save()
+        return
+
+    update_thread_index(forest, roots)
+    postings = None
+    if previous_version is not None and os.path.exists(os.path.join(POSTINGS_DIR, 'version')):
+        postings = ThreadPostings.load()
+    if postings is not None and postings.version == previous_version:
+        postings.extend(forest, roots)
+        postings.save_delta()
+    else:
+        ThreadPostings.build(forest).save()
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import shutil
+import weakref
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from common.reply_forest import ReplyForest
+from config import LAYOUT_CACHE_DIR
+
+Layout = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# Layouts kept in memory; recently viewed threads are re-rendered without touching disk
+MAX_LOADED_LAYOUTS = 128
+
+def tree_layout(forest: ReplyForest, root: int) -> Layout:
+    """
+    Hierarchical layout of the thread below `root` in O(n).
+
+    Returns (nodes in preorder, x, y). Each tweet sits one row below the tweet it replies
+    to; leaves take consecutive columns in preorder, so edges never cross, and every
+    other tweet is centred over its first and last reply.
+    """
+    nodes = np.asarray(forest.subtree(root), dtype=np.int64)
+    sorter = np.argsort(nodes)
+
+    def local(indices):
+        return sorter[np.searchsorted(nodes, indices, sorter=sorter)]
+
+    levels = [local(level) for level in forest.levels(np.array([root], dtype=np.int64))]
+    leaves = (forest.child_offsets[nodes + 1] - forest.child_offsets[nodes]) == 0
+    x = (np.cumsum(leaves) - 1).astype(np.float64)
+    y = np.zeros(len(nodes), dtype=np.float64)
+
+    low = np.full(len(nodes), np.inf)
+    high = np.full(len(nodes), -np.inf)
+    for depth in range(len(levels) - 1, 0, -1):
+        level = levels[depth]
+        y[level] = -depth
+        parents = local(forest.parent[nodes[level]])
+        np.minimum.at(low, parents, x[level])
+        np.maximum.at(high, parents, x[level])
+        above = levels[depth - 1]
+        internal = above[~leaves[above]]
+        x[internal] = (low[internal] + high[internal]) / 2
+    return nodes, x, y
+
+# A layout file's path names the forest content and root it was computed from, so its
+# contents never change and the path alone is a safe cache key
+@lru_cache(maxsize=MAX_LOADED_LAYOUTS)
+def _load(filename: str) -> Layout:
+    with np.load(filename) as data:
+        return data['nodes'], data['x'], data['y']
+
+# Forest -> content digest, so each loaded forest is hashed once
+_content_hashes = weakref.WeakKeyDictionary()
+
+def _content_hash(forest: ReplyForest) -> str:
+    """Digest of the node ids and parents, which are all a layout depends on; computed once per forest."""
+    digest = _content_hashes.get(forest)
+    if digest is None:
+        sha = hashlib.sha1()
+        sha.update(np.ascontiguousarray(forest.tweet_ids).data)
+        sha.update(np.ascontiguousarray(forest.parent).data)
+        digest = _content_hashes[forest] = sha.hexdigest()[:16]
+    return digest
+
+def cached_tree_layout(forest: ReplyForest, root: int, cache_dir: str = LAYOUT_CACHE_DIR) -> Layout:
+    """
+    tree_layout, cached on disk per thread root under a directory for the forest's location
+    and one for its content. When a forest changes, its older layouts are deleted the first
+    time a new one is written; other forests' layouts are left alone.
+    """
+    location = os.path.abspath(forest.path) if forest.path else '<memory>'
+    forest_dir = os.path.join(cache_dir, hashlib.sha1(location.encode()).hexdigest()[:12])
+    content_dir = os.path.join(forest_dir, _content_hash(forest))
+    filename = os.path.join(content_dir, f'{int(root)}.npz')
+    if os.path.exists(filename):
+        return _load(filename)
+
+    if not os.path.isdir(content_dir):
+        if os.path.isdir(forest_dir):
+            for stale in os.listdir(forest_dir):
+                shutil.rmtree(os.path.join(forest_dir, stale), ignore_errors=True)
+        os.makedirs(content_dir, exist_ok=True)
+
+    nodes, x, y = tree_layout(forest, root)
+    staging = f'{filename}.{os.getpid()}.tmp.npz'
+    np.savez(staging, nodes=nodes, x=x, y=y)
+    os.replace(staging, filename)
+    return nodes, x, y
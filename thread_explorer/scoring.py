@@ -0,0 +1,148 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pyarrow.compute as pc
+
+from common.registry import get_registry
+from common.reply_forest import ReplyForest
+
+@dataclass
+class ThreadChunk:
+    """
+    A batch of whole threads handed to metrics.
+
+    `nodes` lists every tweet of the threads rooted at `roots` breadth-first, with its
+    `depth` below the root and `thread`, the position of its root in `roots`.
+    """
+    forest: ReplyForest
+    roots: np.ndarray
+    nodes: np.ndarray
+    depth: np.ndarray
+    thread: np.ndarray
+
+    def column(self, name: str, fill=0) -> np.ndarray:
+        """An attribute column for `nodes`, with `fill` for placeholders and missing values."""
+        return self.forest.node_column(name, self.nodes).fill_null(fill).to_numpy(zero_copy_only=False)
+
+@dataclass(frozen=True)
+class Metric:
+    """
+    A per-thread score: `values` maps a ThreadChunk to one value per node, which are
+    combined per thread with `reduce` ('sum', 'max' or 'distinct'). Metrics run in worker
+    processes, so `values` must be a module-level function.
+    """
+    name: str
+    values: Callable[[ThreadChunk], np.ndarray]
+    reduce: str = 'sum'
+
+def _ones(chunk):
+    return np.ones(len(chunk.nodes), dtype=np.int64)
+
+def _replies(chunk):
+    return chunk.forest.child_offsets[chunk.nodes + 1] - chunk.forest.child_offsets[chunk.nodes]
+
+def _is_branch(chunk):
+    return (_replies(chunk) > 1).astype(np.int64)
+
+def _depth(chunk):
+    return chunk.depth
+
+def _account(chunk):
+    return pc.dictionary_encode(chunk.forest.node_column('account_id', chunk.nodes)).indices \
+        .fill_null(-1).to_numpy(zero_copy_only=False)
+
+def _engagement(chunk):
+    return chunk.column('favorite_count') + chunk.column('retweet_count')
+
+METRICS: Dict[str, Metric] = {metric.name: metric for metric in [
+    Metric('size', _ones),
+    Metric('influence', _replies),
+    Metric('branches', _is_branch),
+    Metric('depth', _depth, 'max'),
+    Metric('participants', _account, 'distinct'),
+    Metric('engagement', _engagement),
+]}
+
+def _reduce(values: np.ndarray, thread: np.ndarray, n: int, how: str) -> np.ndarray:
+    if how == 'sum':
+        return np.bincount(thread, weights=values, minlength=n)
+    if how == 'max':
+        result = np.zeros(n, dtype=values.dtype)
+        np.maximum.at(result, thread, values)
+        return result
+    if how == 'distinct':
+        # Values below zero (e.g. placeholders) are not counted
+        keep = values >= 0
+        pairs = np.unique(np.stack((thread[keep], values[keep])), axis=1)
+        return np.bincount(pairs[0], minlength=n)
+    raise ValueError(f"Unknown reduction: {how}")
+
+def top_k(scores, k=None):
+    """
+    Positions of the k highest scores, best first, ties in position order.
+    Selection is a linear-time partition, so only the chosen rows are sorted.
+    """
+    scores = np.asarray(scores)
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    chosen = np.flatnonzero(scores >= threshold)
+    return chosen[np.argsort(-scores[chosen], kind='stable')][:k]
+
+def _score(forest: ReplyForest, roots: np.ndarray, metrics: Sequence[Metric]) -> Dict[str, np.ndarray]:
+    levels = forest.levels(roots)
+    nodes = np.concatenate(levels)
+    depth = np.repeat(np.arange(len(levels)), [len(level) for level in levels])
+
+    # Thread of each node, propagated level by level through the positions of the parents
+    thread = np.empty(len(nodes), dtype=np.int64)
+    thread[:len(roots)] = np.arange(len(roots))
+    start = 0
+    for previous, level in zip(levels, levels[1:]):
+        sorter = np.argsort(previous)
+        parents = sorter[np.searchsorted(previous, forest.parent[level], sorter=sorter)]
+        end = start + len(previous)
+        thread[end:end + len(level)] = thread[start:end][parents]
+        start = end
+
+    chunk = ThreadChunk(forest, roots, nodes, depth, thread)
+    return {metric.name: _reduce(np.asarray(metric.values(chunk)), thread, len(roots), metric.reduce)
+            for metric in metrics}
+
+def _score_worker(path: str, roots: np.ndarray, metrics: Sequence[Metric]) -> Dict[str, np.ndarray]:
+    # Each worker maps the saved arrays once and keeps them for its later chunks
+    forest = get_registry().get(path, lambda: ReplyForest.load(path))
+    return _score(forest, roots, metrics)
+
+def score_threads(forest: ReplyForest, metrics: Sequence[Metric], roots: Optional[np.ndarray] = None,
+                  workers: Optional[int] = None, chunk_size: int = 20000) -> Dict[str, np.ndarray]:
+    """
+    Score every thread (or those rooted at `roots`) with all `metrics` in one walk.
+
+    Returns {'root': root node indices, metric name: score per root}. With more than one
+    worker and a forest saved on disk, chunks of roots go to a process pool whose workers
+    memory-map the forest themselves, so only root indices and scores are pickled.
+    Forests with unsaved changes are scored in this process.
+    """
+    roots = forest.roots() if roots is None else np.asarray(roots, dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+    if len(roots) == 0:
+        return {'root': roots, **{metric.name: np.zeros(0) for metric in metrics}}
+
+    chunks = [roots[i:i + chunk_size] for i in range(0, len(roots), chunk_size)]
+    if workers == 1 or len(chunks) == 1 or forest.path is None or forest.has_unsaved_changes:
+        results = [_score(forest, chunk, metrics) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            results = list(executor.map(_score_worker, [forest.path] * len(chunks), chunks,
+                                        [metrics] * len(chunks)))
+
+    scores = {'root': roots}
+    for metric in metrics:
+        scores[metric.name] = np.concatenate([result[metric.name] for result in results])
+    return scores
@@ -1,78 +1,99 @@
-import networkx as nx
+import numpy as np
 from common.utils import load_pickle
+from common.registry import get_registry
+from common.reply_forest import ReplyForest
+from .thread_index import load_threads
+from .scoring import METRICS, score_threads, top_k
+from config import REPLY_FOREST_DIR, TWEET_GRAPH_FILE
 
 from typing import Tuple, Dict
-import networkx as nx
 
-def load_data(graph_file: str = 'data/tweet_graph.pkl', account_file: str = 'data/accounts.pkl') -> Tuple[nx.DiGraph, Dict[str, str]]:
+def load_data(forest_dir: str = REPLY_FOREST_DIR, account_file: str = 'data/accounts.pkl',
+              graph_file: str = TWEET_GRAPH_FILE) -> Tuple[ReplyForest, Dict[str, str]]:
     """
-    Load graph and account data from pickle files.
-    If graph file is not found, create an empty graph.
+    Load the reply forest and account data.
+    A graph pickle from older versions is converted if no forest has been built yet; if
+    neither exists, an empty forest is returned.
+    Both are loaded once per process and shared until the files change, so treat them as read-only.
     
     Returns:
-        Tuple[nx.DiGraph, Dict[str, str]]: (NetworkX graph, dict of account names)
+        Tuple[ReplyForest, Dict[str, str]]: (reply forest, dict of account names)
     """
-    try:
-        G = load_pickle(graph_file)
-    except FileNotFoundError:
-        print(f"Warning: {graph_file} not found. Creating an empty graph.")
-        G = nx.DiGraph()
+    if ReplyForest.exists(forest_dir):
+        G = get_registry().get(forest_dir, lambda: ReplyForest.load(forest_dir))
+    else:
+        try:
+            G = get_registry().get(graph_file, lambda: ReplyForest.from_networkx(load_pickle(graph_file)))
+        except FileNotFoundError:
+            print(f"Warning: {forest_dir} not found. Creating an empty graph.")
+            G = ReplyForest.from_tweets([])
     
     try:
-        accounts = load_pickle(account_file)
-        account_names = {str(a['account_id']): a.get('username', f"Unknown (ID: {a['account_id']})") for a in accounts}
+        account_names = get_registry().get(account_file, lambda: {
+            str(a['account_id']): a.get('username', f"Unknown (ID: {a['account_id']})") for a in load_pickle(account_file)
+        }, key='account_names')
     except FileNotFoundError:
         print(f"Warning: {account_file} not found. Using an empty account dictionary.")
         account_names = {}
     
     return G, account_names
 
-def find_interesting_subgraphs(G, method='size', min_chain_length=5, min_component_size=10, min_size=5, max_size=100):
+def find_interesting_subgraphs(G, method='size', min_chain_length=5, min_component_size=10, min_size=5, max_size=100,
+                               threads=None, limit=None, workers=None):
     """
-    Find interesting subgraphs in the given graph.
+    Find interesting subgraphs in the given reply forest.
+
+    Every weakly connected component of a reply graph is one thread, a tree hanging from
+    its root, so all methods rank rows of the per-thread index (see thread_index.py) and
+    each thread is returned at most once. Only the `limit` best threads are expanded into
+    node lists. Threads of a single tweet are not in the index and are never returned.
     
     Args:
-        G (nx.Graph): Input graph
-        method (str): Method to use for finding subgraphs ('size', 'branching', or 'influence')
+        G (ReplyForest): Input reply forest
+        method (str or Metric): 'size', 'branching', 'influence', a name from scoring.METRICS or a Metric
         min_chain_length (int): Minimum chain length for 'size' method
         min_component_size (int): Minimum component size for 'size' method
-        min_size (int): Minimum subgraph size for 'branching' method
-        max_size (int): Maximum subgraph size for 'branching' method
+        min_size (int): Minimum subgraph size for methods other than 'size'
+        max_size (int): Maximum subgraph size for methods other than 'size'
+        threads (pyarrow.Table): Per-thread index for G (default: the saved index, or computed)
+        limit (int): Maximum number of subgraphs to return (default: all)
+        workers (int): Processes used to score metrics (default: one per CPU)
     
     Returns:
-        list: List of interesting subgraphs
+        list: List of interesting subgraphs, each a list of node indices with the root first
     """
-    if method == 'influence':
-        def influence_score(subgraph):
-            return sum(subgraph.out_degree(node) for node in subgraph)
-        
-        components = list(nx.weakly_connected_components(G))
-        interesting_components = [
-            c for c in components 
-            if min_size <= len(c) <= max_size
-        ]
-        return sorted(interesting_components, key=lambda c: influence_score(G.subgraph(c)), reverse=True)
+    if isinstance(method, str) and method not in ('size', 'branching', 'influence') + tuple(METRICS):
+        raise ValueError(f"Method must be one of 'size', 'branching', 'influence' or {', '.join(METRICS)}")
+
+    if threads is None:
+        threads = load_threads(G)
+    # Rows in forest order, so ties keep ranking the same way however the index was updated
+    rows = np.argsort(threads.column('root').to_numpy(), kind='stable')
+    roots = threads.column('root').to_numpy()[rows]
+    sizes = threads.column('size').to_numpy()[rows]
+
     if method == 'size':
-        chains = [set(nx.dfs_preorder_nodes(G, node)) for node in G if G.in_degree(node) == 0]
-        chains = [c for c in chains if len(c) >= min_chain_length]
-        components = [c for c in nx.weakly_connected_components(G) if len(c) >= min_component_size]
-        return sorted(chains + components, key=len, reverse=True)
-    elif method == 'branching':
-        def branching_factor(subgraph):
-            return sum(1 for node in subgraph if subgraph.out_degree(node) > 1) / len(subgraph)
-        
-        components = list(nx.weakly_connected_components(G))
-        interesting_components = [
-            c for c in components 
-            if min_size <= len(c) <= max_size
-        ]
-        return sorted(interesting_components, key=lambda c: branching_factor(G.subgraph(c)), reverse=True)
+        # Each thread is both the chain from its root and its component
+        selected = sizes >= min(min_chain_length, min_component_size)
+        scores = sizes[selected]
     else:
-        raise ValueError("Method must be either 'size' or 'branching'")
+        selected = (sizes >= min_size) & (sizes <= max_size)
+        if method == 'influence':
+            # Sum of out-degrees over a tree is its number of edges
+            scores = sizes[selected] - 1
+        elif method == 'branching':
+            scores = threads.column('branches').to_numpy()[rows][selected] / sizes[selected]
+        else:
+            metric = METRICS[method] if isinstance(method, str) else method
+            scores = score_threads(G, [metric], roots=roots[selected], workers=workers)[metric.name]
+
+    candidates = roots[selected]
+    return [G.subtree(int(root)) for root in candidates[top_k(scores, limit)]]
 
 def get_unique_subgraphs(subgraphs, num_subgraphs=20):
     """
     Get a list of unique subgraphs from the given subgraphs.
+    Subgraphs are whole threads with the root first, so they are told apart by root.
     
     Args:
         subgraphs (list): List of subgraphs
@@ -84,8 +105,9 @@ def get_unique_subgraphs(subgraphs, num_subgraphs=20):
     seen = set()
     unique = []
     for subgraph in subgraphs:
-        key = frozenset(subgraph)
-        if key not in seen and len(unique) < num_subgraphs:
+        if len(unique) >= num_subgraphs:
+            break
+        if subgraph[0] not in seen:
             unique.append(subgraph)
-            seen.add(key)
+            seen.add(subgraph[0])
     return unique
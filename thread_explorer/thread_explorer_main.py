@@ -1,5 +1,5 @@
 from .subgraph_utils import load_data, find_interesting_subgraphs, get_unique_subgraphs
-from .visualize import visualize_subgraphs
+from .visualize import visualize_subgraphs, visualize_page
 
 def thread_explorer_main(args):
     """
@@ -15,24 +15,36 @@ def thread_explorer_main(args):
     
     if G.number_of_nodes() == 0:
         print("Error: The graph is empty. Please run the graph builder first.")
-        print("You can build the graph by running: python main.py graph")
+        print("You can build the graph by running: python main.py build_graph")
         return None
     
     # Find interesting subgraphs
     method = args.method if hasattr(args, 'method') else 'size'
-    all_subgraphs = find_interesting_subgraphs(G, method=method)
+    num_subgraphs = args.num_subgraphs if hasattr(args, 'num_subgraphs') else 20
+    all_subgraphs = find_interesting_subgraphs(G, method=method, limit=num_subgraphs,
+                                               workers=getattr(args, 'workers', None))
     
     if not all_subgraphs:
         print("No interesting subgraphs found.")
         return None
     
     # Get unique subgraphs
-    num_subgraphs = args.num_subgraphs if hasattr(args, 'num_subgraphs') else 20
     interesting_subgraphs = get_unique_subgraphs(all_subgraphs, num_subgraphs)
     
-    # Visualize subgraphs
-    fig = visualize_subgraphs(G, interesting_subgraphs, account_names, num_to_show=num_subgraphs)
-    
-    print(f"Thread exploration complete. {len(interesting_subgraphs)} subgraphs visualized.")
+    # Visualize subgraphs, either all in one grid or a page of them at a time
+    node_budget = getattr(args, 'node_budget', None) or 2000
+    page = getattr(args, 'page', None)
+    if page is None:
+        fig = visualize_subgraphs(G, interesting_subgraphs, account_names, num_to_show=num_subgraphs,
+                                  node_budget=node_budget)
+        print(f"Thread exploration complete. {len(interesting_subgraphs)} subgraphs visualized.")
+    else:
+        per_page = getattr(args, 'per_page', None) or 1
+        fig = visualize_page(G, interesting_subgraphs, account_names, page=page, per_page=per_page,
+                             node_budget=node_budget)
+        if fig is None:
+            print(f"Page {page + 1} is empty; {len(interesting_subgraphs)} subgraphs were found.")
+            return None
+        print(f"Thread exploration complete. Page {page + 1} visualized.")
 
     return fig
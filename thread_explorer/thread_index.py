@@ -0,0 +1,211 @@
+import glob
+import os
+import shutil
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.registry import get_registry
+from common.reply_forest import ReplyForest
+from config import THREAD_INDEX_DIR
+
+NODES_FILE = 'nodes.parquet'
+THREADS_FILE = 'threads.parquet'
+VERSION_FILE = 'version'
+# Saved updates beyond this are compacted into the base
+MAX_DELTAS = 8
+
+NODE_SCHEMA = pa.schema([
+    ('tweet_id', pa.int64()),
+    ('node', pa.int64()),
+    ('root_id', pa.int64()),
+    ('component', pa.int64()),
+    ('depth', pa.int32()),
+    ('subtree_size', pa.int64()),
+    ('descendants', pa.int64()),
+    ('branches', pa.int64()),
+    ('participants', pa.int32()),
+])
+
+THREAD_SCHEMA = pa.schema([
+    ('component', pa.int64()),
+    ('root_id', pa.int64()),
+    ('root', pa.int64()),
+    ('size', pa.int64()),
+    ('depth', pa.int32()),
+    ('branches', pa.int64()),
+    ('participants', pa.int32()),
+    ('account_id', pa.string()),
+    ('created_ts', pa.int64()),
+])
+
+def compute_thread_index(forest: ReplyForest, roots: Optional[Iterable[int]] = None) -> Tuple[pa.Table, pa.Table]:
+    """
+    Per-tweet and per-thread statistics for the whole forest, or for the threads of `roots`.
+
+    Tweet rows: root and component (the root's node index, stable across forest updates),
+    depth below the root, subtree size, descendants, branching tweets (more than one reply)
+    in the subtree and distinct accounts in the subtree. Thread rows summarize each thread
+    of two or more tweets from its root. Distinct accounts are merged small-into-large up
+    the tree, so every account id is copied O(log n) times at most.
+    """
+    levels = forest.levels(None if roots is None else np.asarray(list(roots), dtype=np.int64))
+    if not levels:
+        return NODE_SCHEMA.empty_table(), THREAD_SCHEMA.empty_table()
+
+    nodes = np.concatenate(levels)
+    depth = np.repeat(np.arange(len(levels), dtype=np.int32), [len(level) for level in levels])
+    sorter = np.argsort(nodes, kind='stable')
+
+    def local(indices):
+        return sorter[np.searchsorted(nodes, indices, sorter=sorter)]
+
+    parent = np.full(len(nodes), -1, dtype=np.int64)
+    children = depth > 0
+    parent[children] = local(np.asarray(forest.parent[nodes[children]], dtype=np.int64))
+
+    root = np.arange(len(nodes), dtype=np.int64)
+    sizes = np.ones(len(nodes), dtype=np.int64)
+    branches = (np.asarray(forest.child_offsets[nodes + 1] - forest.child_offsets[nodes]) > 1).astype(np.int64)
+    bounds = np.cumsum([0] + [len(level) for level in levels])
+    for start, end in zip(bounds[1:-1], bounds[2:]):
+        root[start:end] = root[parent[start:end]]
+    for start, end in reversed(list(zip(bounds[1:-1], bounds[2:]))):
+        np.add.at(sizes, parent[start:end], sizes[start:end])
+        np.add.at(branches, parent[start:end], branches[start:end])
+
+    accounts = pc.dictionary_encode(forest.node_column('account_id', nodes)).indices
+    accounts = accounts.fill_null(-1).to_numpy(zero_copy_only=False)
+    participants = np.zeros(len(nodes), dtype=np.int32)
+    sets = [None] * len(nodes)
+    for i in range(len(nodes) - 1, -1, -1):
+        members = sets[i] if sets[i] is not None else set()
+        sets[i] = None
+        if accounts[i] >= 0:
+            members.add(int(accounts[i]))
+        participants[i] = len(members)
+        p = parent[i]
+        if p >= 0:
+            if sets[p] is None:
+                sets[p] = members
+            else:
+                if len(sets[p]) < len(members):
+                    sets[p], members = members, sets[p]
+                sets[p].update(members)
+
+    tweet_ids = np.asarray(forest.tweet_ids[nodes], dtype=np.int64)
+    node_table = pa.table({
+        'tweet_id': tweet_ids,
+        'node': nodes,
+        'root_id': tweet_ids[root],
+        'component': nodes[root],
+        'depth': depth,
+        'subtree_size': sizes,
+        'descendants': sizes - 1,
+        'branches': branches,
+        'participants': participants,
+    }, schema=NODE_SCHEMA)
+
+    height = np.zeros(len(nodes), dtype=np.int32)
+    np.maximum.at(height, root, depth)
+    thread_rows = np.flatnonzero((depth == 0) & (sizes > 1))
+    thread_table = pa.table({
+        'component': nodes[thread_rows],
+        'root_id': tweet_ids[thread_rows],
+        'root': nodes[thread_rows],
+        'size': sizes[thread_rows],
+        'depth': height[thread_rows],
+        'branches': branches[thread_rows],
+        'participants': participants[thread_rows],
+        'account_id': forest.node_column('account_id', nodes[thread_rows]),
+        'created_ts': forest.node_column('created_ts', nodes[thread_rows]),
+    }, schema=THREAD_SCHEMA)
+    return node_table, thread_table
+
+def _delta_dirs(path: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(path, 'delta_*')))
+
+def _write_index(nodes: pa.Table, threads: pa.Table, forest: ReplyForest, path: str):
+    os.makedirs(path, exist_ok=True)
+    pq.write_table(nodes, os.path.join(path, NODES_FILE))
+    pq.write_table(threads, os.path.join(path, THREADS_FILE))
+    # Written last: the forest version the index matches, also the key of cached copies
+    with open(os.path.join(path, VERSION_FILE), 'w') as f:
+        f.write(forest.version)
+
+def _read_index(path: str, nodes: bool = True) -> Tuple[Optional[pa.Table], pa.Table]:
+    """
+    (nodes, threads) as saved in `path` with its deltas applied: a delta's rows replace
+    every older row for the tweets it recomputed. Without `nodes`, only the thread table
+    and each delta's tweet ids are read.
+    """
+    node_table = pq.read_table(os.path.join(path, NODES_FILE)).cast(NODE_SCHEMA) if nodes else None
+    threads = pq.read_table(os.path.join(path, THREADS_FILE), memory_map=True)
+    for delta_dir in _delta_dirs(path):
+        delta_nodes = pq.read_table(os.path.join(delta_dir, NODES_FILE), columns=None if nodes else ['tweet_id'])
+        recomputed = delta_nodes.column('tweet_id')
+        if nodes:
+            kept = node_table.filter(pc.invert(pc.is_in(node_table.column('tweet_id'), value_set=recomputed)))
+            node_table = pa.concat_tables([kept, delta_nodes.cast(NODE_SCHEMA)])
+        kept = threads.filter(pc.invert(pc.is_in(threads.column('root_id'), value_set=recomputed)))
+        delta_threads = pq.read_table(os.path.join(delta_dir, THREADS_FILE))
+        threads = pa.concat_tables([kept.cast(THREAD_SCHEMA), delta_threads.cast(THREAD_SCHEMA)])
+    return node_table, threads
+
+def save_thread_index(forest: ReplyForest, path: str = THREAD_INDEX_DIR):
+    """Build the index for the whole forest and write it to `path`."""
+    nodes, threads = compute_thread_index(forest)
+    _write_index(nodes, threads, forest, path)
+    for delta_dir in _delta_dirs(path):
+        shutil.rmtree(delta_dir)
+    print(f"Thread index with {threads.num_rows} threads saved to {path}")
+
+def update_thread_index(forest: ReplyForest, roots: Iterable[int], path: str = THREAD_INDEX_DIR):
+    """
+    Recompute the index rows for the threads of `roots` (as returned by ReplyForest.extend)
+    and save just those as a delta, which replaces the older rows of the same tweets when
+    read. Threads that were merged into one of them drop out, since their old roots are
+    now tweets inside it. Past MAX_DELTAS deltas the index is compacted into one base.
+    """
+    if not os.path.exists(os.path.join(path, THREADS_FILE)):
+        return save_thread_index(forest, path)
+
+    new_nodes, new_threads = compute_thread_index(forest, roots)
+    deltas = _delta_dirs(path)
+    if len(deltas) < MAX_DELTAS:
+        delta_dir = os.path.join(path, f'delta_{len(deltas):06d}')
+        os.makedirs(delta_dir)
+        pq.write_table(new_nodes, os.path.join(delta_dir, NODES_FILE))
+        pq.write_table(new_threads, os.path.join(delta_dir, THREADS_FILE))
+        with open(os.path.join(path, VERSION_FILE), 'w') as f:
+            f.write(forest.version)
+    else:
+        nodes, threads = _read_index(path)
+        recomputed = new_nodes.column('tweet_id')
+        nodes = nodes.filter(pc.invert(pc.is_in(nodes.column('tweet_id'), value_set=recomputed)))
+        threads = threads.filter(pc.invert(pc.is_in(threads.column('root_id'), value_set=recomputed)))
+        _write_index(pa.concat_tables([nodes, new_nodes]), pa.concat_tables([threads.cast(THREAD_SCHEMA), new_threads]),
+                     forest, path)
+        for delta_dir in deltas:
+            shutil.rmtree(delta_dir)
+    print(f"Thread index updated: {new_threads.num_rows} threads recomputed")
+
+def load_threads(forest: ReplyForest, path: str = THREAD_INDEX_DIR) -> pa.Table:
+    """
+    The per-thread table for `forest`, read from the saved index when it was saved for this
+    forest version and computed on the spot otherwise.
+    """
+    version_file = os.path.join(path, VERSION_FILE)
+    if os.path.exists(os.path.join(path, THREADS_FILE)):
+        version = None
+        if os.path.exists(version_file):
+            with open(version_file) as f:
+                version = f.read().strip()
+        if version == forest.version:
+            return get_registry().get(version_file, lambda: _read_index(path, nodes=False)[1])
+        print(f"Warning: thread index in {path} is out of date, computing it in memory. "
+              f"Rebuild it with: python main.py build_graph")
+    return compute_thread_index(forest)[1]
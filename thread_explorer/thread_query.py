@@ -0,0 +1,359 @@
+import glob
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+from functools import reduce
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyarrow.compute as pc
+
+from common.registry import get_registry
+from common.reply_forest import ReplyForest, save_arrays
+from common.tweet import to_timestamp
+from config import THREAD_INDEX_DIR
+from .scoring import METRICS, score_threads, top_k
+
+POSTINGS_DIR = os.path.join(THREAD_INDEX_DIR, 'postings')
+POSTING_ARRAYS = ['root', 'created_ts', 'account_keys', 'account_offsets', 'account_nodes',
+                  'term_keys', 'term_offsets', 'term_nodes']
+# Saved updates beyond this are merged into the base lists
+MAX_DELTAS = 8
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, as indexed and as matched by keyword queries."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def _postings(codes: np.ndarray, nodes: np.ndarray, num_keys: int):
+    """CSR posting lists: offsets[k]:offsets[k + 1] are the nodes of key k, ascending."""
+    order = np.lexsort((nodes, codes))
+    offsets = np.searchsorted(codes[order], np.arange(num_keys + 1))
+    return offsets.astype(np.int64), nodes[order].astype(np.int64)
+
+Segment = Tuple[np.ndarray, np.ndarray, np.ndarray]  # sorted keys, CSR offsets, nodes
+
+def _segment(keys: List[str], nodes: np.ndarray) -> Segment:
+    """Posting lists for (keys[i], nodes[i]) pairs."""
+    unique, codes = np.unique(np.array(keys, dtype=str), return_inverse=True)
+    offsets, nodes = _postings(codes.reshape(-1), np.asarray(nodes, dtype=np.int64), len(unique))
+    return unique, offsets, nodes
+
+def _merge_segments(segments: List[Segment]) -> Segment:
+    """One set of posting lists holding the postings of every segment."""
+    keys = reduce(np.union1d, [np.asarray(k) for k, _, _ in segments]).astype(str)
+    codes = np.concatenate([np.repeat(np.searchsorted(keys, np.asarray(k)), np.diff(np.asarray(offsets)))
+                            for k, offsets, _ in segments])
+    offsets, nodes = _postings(codes, np.concatenate([np.asarray(n) for _, _, n in segments]), len(keys))
+    return keys, offsets, nodes
+
+@dataclass
+class PostingsDelta:
+    """
+    One `ThreadPostings.extend` call: the forest's new size, the nodes whose thread root
+    changed (every node of a changed thread) with their roots, the new tweets' timestamps,
+    and posting lists for just the new tweets.
+    """
+    num_nodes: int
+    root_nodes: np.ndarray
+    roots: np.ndarray
+    ts_nodes: np.ndarray
+    ts: np.ndarray
+    accounts: Segment
+    terms: Segment
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        arrays = {'num_nodes': np.array([self.num_nodes]), 'root_nodes': self.root_nodes, 'roots': self.roots,
+                  'ts_nodes': self.ts_nodes, 'ts': self.ts}
+        for prefix, segment in (('account', self.accounts), ('term', self.terms)):
+            arrays.update(zip([f'{prefix}_keys', f'{prefix}_offsets', f'{prefix}_nodes'], segment))
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+
+    @classmethod
+    def load(cls, path: str) -> 'PostingsDelta':
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'))
+        return cls(int(array('num_nodes')[0]), array('root_nodes'), array('roots'), array('ts_nodes'), array('ts'),
+                   tuple(array(f'account_{n}') for n in ('keys', 'offsets', 'nodes')),
+                   tuple(array(f'term_{n}') for n in ('keys', 'offsets', 'nodes')))
+
+class ThreadPostings:
+    """
+    Per-account and per-term posting lists of tweets, plus each tweet's thread root and
+    timestamp, so queries touch only the tweets that match instead of every thread.
+    Keys are sorted, so finding a list is a binary search.
+
+    Updates add a segment of posting lists for just the new tweets, saved as a delta next
+    to the base lists; a lookup searches every segment. `save` merges them into one.
+    """
+
+    def __init__(self, root, created_ts, accounts: List[Segment], terms: List[Segment], version: str = ''):
+        self.root = root
+        self.created_ts = created_ts
+        self.accounts = accounts
+        self.terms = terms
+        self.version = version
+        self._unsaved: List[PostingsDelta] = []
+
+    @classmethod
+    def build(cls, forest: ReplyForest) -> 'ThreadPostings':
+        nodes = np.arange(len(forest), dtype=np.int64)
+        created_ts = forest.node_column('created_ts', nodes).fill_null(np.iinfo(np.int64).min)
+        created_ts = created_ts.to_numpy(zero_copy_only=False).astype(np.int64)
+
+        accounts = pc.dictionary_encode(forest.node_column('account_id', nodes))
+        account_codes = accounts.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        account_keys = np.array(accounts.dictionary.to_pylist(), dtype=str)
+        has_account = account_codes >= 0
+        # Keys are sorted so lookups can binary search them
+        key_order = np.argsort(account_keys)
+        rank = np.empty(len(key_order), dtype=np.int64)
+        rank[key_order] = np.arange(len(key_order))
+        account_offsets, account_nodes = _postings(rank[account_codes[has_account]], nodes[has_account],
+                                                   len(account_keys))
+
+        vocabulary, term_codes, term_nodes = {}, [], []
+        for node, text in enumerate(forest.node_column('full_text', nodes).to_pylist()):
+            if not text:
+                continue
+            for term in set(tokenize(text)):
+                term_codes.append(vocabulary.setdefault(term, len(vocabulary)))
+                term_nodes.append(node)
+        term_keys = np.array(list(vocabulary), dtype=str)
+        term_order = np.argsort(term_keys)
+        term_rank = np.empty(len(term_order), dtype=np.int64)
+        term_rank[term_order] = np.arange(len(term_order))
+        term_offsets, term_nodes = _postings(term_rank[np.array(term_codes, dtype=np.int64)],
+                                             np.array(term_nodes, dtype=np.int64), len(term_keys))
+
+        return cls(forest.root_ids(), created_ts, [(account_keys[key_order], account_offsets, account_nodes)],
+                   [(term_keys[term_order], term_offsets, term_nodes)], version=forest.version)
+
+    def extend(self, forest: ReplyForest, roots: Iterable[int]):
+        """
+        Bring the lists up to date with `forest` after ReplyForest.extend, given the roots it
+        returned and lists matching the forest before it. Only the changed threads are walked
+        and only the new tweets (appended nodes and filled-in placeholders) are tokenized;
+        their postings become a new segment, kept for `save_delta`.
+        """
+        missing = np.iinfo(np.int64).min
+        num_old = len(self.root)
+        # Threads may have merged, so every node of a changed thread gets its root again
+        levels = forest.levels(np.asarray(roots, dtype=np.int64))
+        touched = np.concatenate([np.empty(0, dtype=np.int64)] + levels)
+        sorter = np.argsort(touched)
+        bounds = np.cumsum([0] + [len(level) for level in levels])
+        touched_roots = touched.copy()
+        for start, end in zip(bounds[1:-1], bounds[2:]):
+            parents = np.asarray(forest.parent[touched[start:end]], dtype=np.int64)
+            touched_roots[start:end] = touched_roots[sorter[np.searchsorted(touched, parents, sorter=sorter)]]
+
+        old = touched[touched < num_old]
+        nodes = np.concatenate((old[np.asarray(self.created_ts)[old] == missing],
+                                np.arange(num_old, len(forest), dtype=np.int64)))
+        ts = forest.node_column('created_ts', nodes).fill_null(missing).to_numpy(zero_copy_only=False)
+        # Placeholders have no account or text, so only tweets that arrived get postings
+        tweets = nodes[ts != missing]
+
+        accounts = forest.node_column('account_id', tweets).to_pylist()
+        has_account = np.array([account is not None for account in accounts], dtype=bool)
+        terms, term_nodes = [], []
+        for node, text in zip(tweets, forest.node_column('full_text', tweets).to_pylist()):
+            for term in set(tokenize(text or '')):
+                terms.append(term)
+                term_nodes.append(node)
+
+        delta = PostingsDelta(len(forest), touched, touched_roots, nodes, ts.astype(np.int64),
+                              _segment([account for account in accounts if account is not None], tweets[has_account]),
+                              _segment(terms, np.array(term_nodes, dtype=np.int64)))
+        self._apply(delta)
+        self._unsaved.append(delta)
+        self.version = forest.version
+
+    def _apply(self, delta: PostingsDelta):
+        grown = delta.num_nodes - len(self.root)
+        self.root = np.concatenate((self.root, np.arange(len(self.root), delta.num_nodes, dtype=np.int64)))
+        self.root[delta.root_nodes] = delta.roots
+        self.created_ts = np.concatenate((self.created_ts, np.full(grown, np.iinfo(np.int64).min, dtype=np.int64)))
+        self.created_ts[delta.ts_nodes] = delta.ts
+        self.accounts = self.accounts + [delta.accounts]
+        self.terms = self.terms + [delta.terms]
+
+    def save(self, path: str = POSTINGS_DIR):
+        """Write the lists as a new base, merging every segment and removing saved deltas."""
+        os.makedirs(path, exist_ok=True)
+        accounts, terms = _merge_segments(self.accounts), _merge_segments(self.terms)
+        save_arrays(dict(zip(POSTING_ARRAYS, (self.root, self.created_ts) + accounts + terms)), path)
+        for delta_dir in self._delta_dirs(path):
+            shutil.rmtree(delta_dir)
+        self.accounts, self.terms, self._unsaved = [accounts], [terms], []
+        self._write_version(path)
+
+    def save_delta(self, path: str = POSTINGS_DIR):
+        """Persist the segments added by `extend`, compacting once more than MAX_DELTAS would exist."""
+        if len(self._delta_dirs(path)) + len(self._unsaved) > MAX_DELTAS:
+            self.save(path)
+            return
+        for delta in self._unsaved:
+            delta.save(os.path.join(path, f'delta_{len(self._delta_dirs(path)):06d}'))
+        self._unsaved = []
+        self._write_version(path)
+
+    def _write_version(self, path: str):
+        # Written last: load_postings keys its cached copy on this file
+        with open(os.path.join(path, 'version'), 'w') as f:
+            f.write(self.version)
+
+    @staticmethod
+    def _delta_dirs(path: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(path, 'delta_*')))
+
+    @classmethod
+    def load(cls, path: str = POSTINGS_DIR) -> 'ThreadPostings':
+        arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in POSTING_ARRAYS]
+        with open(os.path.join(path, 'version')) as f:
+            postings = cls(arrays[0], arrays[1], [tuple(arrays[2:5])], [tuple(arrays[5:8])], version=f.read().strip())
+        for delta_dir in cls._delta_dirs(path):
+            postings._apply(PostingsDelta.load(delta_dir))
+        return postings
+
+    @staticmethod
+    def _lookup(segments: List[Segment], key: str) -> np.ndarray:
+        found = []
+        for keys, offsets, nodes in segments:
+            i = int(np.searchsorted(keys, key))
+            if i < len(keys) and keys[i] == key:
+                found.append(np.asarray(nodes[offsets[i]:offsets[i + 1]]))
+        if len(found) == 1:
+            return found[0]
+        return np.sort(np.concatenate(found + [np.empty(0, dtype=np.int64)]))
+
+    def account_tweets(self, account_id: str) -> np.ndarray:
+        return self._lookup(self.accounts, str(account_id))
+
+    def term_tweets(self, term: str) -> np.ndarray:
+        return self._lookup(self.terms, term.lower())
+
+    def threads(self, account_ids: Optional[Iterable[str]] = None, keywords: Optional[Iterable[str]] = None,
+                start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> np.ndarray:
+        """
+        Root node indices, ascending, of the threads where any of `account_ids` tweeted and
+        every token of every keyword appears, counting only tweets from [start_ts, end_ts].
+        Keywords match whole tokens anywhere in a thread, not necessarily in one tweet.
+        """
+        windowed = start_ts is not None or end_ts is not None
+        start_ts = np.iinfo(np.int64).min if start_ts is None else start_ts
+        end_ts = np.iinfo(np.int64).max if end_ts is None else end_ts
+
+        def roots_of(nodes):
+            if windowed:
+                ts = self.created_ts[nodes]
+                nodes = nodes[(ts >= start_ts) & (ts <= end_ts)]
+            return np.unique(self.root[nodes])
+
+        candidates = []
+        if account_ids is not None:
+            candidates.append(roots_of(np.concatenate(
+                [self.account_tweets(a) for a in account_ids] + [np.empty(0, dtype=np.int64)])))
+        for keyword in keywords or []:
+            for term in tokenize(keyword):
+                candidates.append(roots_of(self.term_tweets(term)))
+        if not candidates:
+            ts = np.asarray(self.created_ts)
+            candidates.append(np.unique(self.root[np.flatnonzero((ts >= start_ts) & (ts <= end_ts))]))
+
+        # Intersect the shortest lists first so later steps work on as few ids as possible
+        return reduce(np.intersect1d, sorted(candidates, key=len)).astype(np.int64)
+
+def load_postings(forest: ReplyForest, path: str = POSTINGS_DIR) -> ThreadPostings:
+    """The saved posting lists for `forest`, rebuilt and saved if missing or out of date."""
+    version_file = os.path.join(path, 'version')
+    if os.path.exists(version_file):
+        postings = get_registry().get(version_file, lambda: ThreadPostings.load(path))
+        if postings.version == forest.version:
+            return postings
+    print(f"Building thread posting lists in {path}...")
+    postings = ThreadPostings.build(forest)
+    postings.save(path)
+    return postings
+
+def query_threads(G: ReplyForest, postings: ThreadPostings, account_ids=None, keywords=None,
+                  start_ts=None, end_ts=None, method='size', limit=20, workers=None) -> List[List[int]]:
+    """
+    Find threads by participant, keyword and date and rank only those.
+
+    Args:
+        G (ReplyForest): Input reply forest
+        postings (ThreadPostings): Posting lists built from G
+        account_ids (list): Threads must include a tweet from one of these accounts
+        keywords (list): Threads must contain every keyword
+        start_ts, end_ts (int): Only tweets in this window count towards the filters
+        method (str or Metric): A name from scoring.METRICS or a Metric to rank by
+        limit (int): Maximum number of threads to return
+        workers (int): Processes used to score the candidates
+
+    Returns:
+        list: Matching threads, best first, each a list of node indices with the root first
+    """
+    metric = METRICS[method] if isinstance(method, str) else method
+    roots = postings.threads(account_ids, keywords, start_ts, end_ts)
+    if len(roots) == 0:
+        return []
+    scores = score_threads(G, [metric], roots=roots, workers=workers)[metric.name]
+    return [G.subtree(int(root)) for root in roots[top_k(scores, limit)]]
+
+def _timestamp(value, end_of_day=False) -> Optional[int]:
+    """Epoch seconds for a YYYY-MM-DD string or datetime, naive values in UTC like created_ts."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+        if end_of_day:
+            value = value.replace(hour=23, minute=59, second=59)
+    return to_timestamp(value)
+
+def find_threads_main(args):
+    """
+    Print the best threads matching the query in `args`.
+
+    Args:
+        args: Parsed command-line arguments (usernames, keywords, start_date, end_date, method, limit).
+    """
+    from .subgraph_utils import load_data
+    G, account_names = load_data()
+    if G.number_of_nodes() == 0:
+        print("Error: The graph is empty. Please run the graph builder first.")
+        print("You can build the graph by running: python main.py build_graph")
+        return None
+
+    account_ids = None
+    usernames = getattr(args, 'usernames', None)
+    if usernames:
+        wanted = {username.lower() for username in usernames}
+        account_ids = [account_id for account_id, name in account_names.items() if name.lower() in wanted]
+        if not account_ids:
+            print(f"No known accounts for: {', '.join(usernames)}")
+            return []
+
+    postings = load_postings(G)
+    threads = query_threads(G, postings, account_ids=account_ids, keywords=getattr(args, 'keywords', None),
+                            start_ts=_timestamp(getattr(args, 'start_date', None)),
+                            end_ts=_timestamp(getattr(args, 'end_date', None), end_of_day=True),
+                            method=getattr(args, 'method', None) or 'size', limit=getattr(args, 'limit', None) or 20,
+                            workers=getattr(args, 'workers', None))
+
+    if not threads:
+        print("No matching threads found.")
+        return threads
+
+    for rank, (thread, data) in enumerate(zip(threads, G.node_attributes([thread[0] for thread in threads])), 1):
+        data = data or {}
+        author = account_names.get(str(data.get('account_id')), 'Unknown')
+        text = ' '.join(str(data.get('full_text', '')).split())[:80]
+        print(f"{rank:>3}. {G.tweet_id(thread[0])}  {len(thread):>6} tweets  {data.get('created_at', '')}  @{author}: {text}")
+    return threads
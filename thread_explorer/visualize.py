@@ -1,102 +1,157 @@
-import networkx as nx
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
+import numpy as np
 import textwrap
 import math
 
-def count_branches(subgraph):
-    """Count the number of branches in a subgraph."""
-    return sum(1 for node in subgraph if subgraph.out_degree(node) > 1)
+from .layout import cached_tree_layout
 
-def custom_layout(G, iterations=10):
+def collapse_thread(G, root, node_budget=2000):
     """
-    Create a combined layout for the graph using spectral and force-directed algorithms.
-    
+    Lay out the thread at `root` and keep at most `node_budget` of its tweets, shallowest
+    first, so deep subtrees are folded into the last tweet shown above them.
+
     Args:
-        G (nx.Graph): Input graph
-        iterations (int): Number of iterations for force-directed algorithm
-    
+        G (ReplyForest): Full reply forest
+        root (int): Root node index of the thread
+        node_budget (int): Maximum number of tweets to keep
+
     Returns:
-        dict: Node positions
+        tuple: (node indices, x, y, parent position or -1, number of hidden replies below each node)
+    """
+    nodes, x, y = cached_tree_layout(G, root)
+    sorter = np.argsort(nodes)
+    parent = np.full(len(nodes), -1, dtype=np.int64)
+    parent[1:] = sorter[np.searchsorted(nodes, G.parent[nodes[1:]], sorter=sorter)]
+
+    # Layout rows are minus the depth, and preorder keeps siblings in order within a row
+    depth = (-y).astype(np.int64)
+    sizes = np.ones(len(nodes), dtype=np.int64)
+    for level in range(depth.max(), 0, -1):
+        at_level = np.flatnonzero(depth == level)
+        np.add.at(sizes, parent[at_level], sizes[at_level])
+
+    kept = np.zeros(len(nodes), dtype=bool)
+    kept[np.lexsort((np.arange(len(nodes)), depth))[:node_budget]] = True
+    hidden = np.zeros(len(nodes), dtype=np.int64)
+    cut = np.flatnonzero(~kept & (parent >= 0))
+    cut = cut[kept[parent[cut]]]
+    np.add.at(hidden, parent[cut], sizes[cut])
+
+    positions = np.flatnonzero(kept)
+    new_position = np.cumsum(kept) - 1
+    kept_parent = np.where(parent[positions] >= 0, new_position[parent[positions]], -1)
+    return nodes[positions], x[positions], y[positions], kept_parent, hidden[positions]
+
+def thread_traces(G, root, account_names, node_budget=2000):
     """
-    pos = nx.spectral_layout(G)
-    pos = nx.fruchterman_reingold_layout(G, pos=pos, iterations=iterations)
-    return pos
+    WebGL traces for one thread: its reply edges and its tweets, coloured by reply count.
+    Node attributes are read as columns for all shown tweets at once.
+
+    Returns:
+        tuple: (edge trace, node trace, title)
+    """
+    nodes, x, y, parent, hidden = collapse_thread(G, root, node_budget)
+
+    children = np.flatnonzero(parent >= 0)
+    edge_x = np.column_stack((x[parent[children]], x[children], np.full(len(children), np.nan))).ravel()
+    edge_y = np.column_stack((y[parent[children]], y[children], np.full(len(children), np.nan))).ravel()
+    edge_trace = go.Scattergl(
+        x=edge_x, y=edge_y,
+        line=dict(width=0.5, color='#888'),
+        hoverinfo='none',
+        mode='lines')
+
+    replies = np.asarray(G.child_offsets[nodes + 1] - G.child_offsets[nodes])
+    account_ids = G.node_column('account_id', nodes).to_pylist()
+    texts = G.node_column('full_text', nodes).to_pylist()
+    authors = [account_names.get(a, f"Unknown (ID: {a})") if a is not None else 'Missing tweet' for a in account_ids]
+    node_text = [
+        f"{author}<br>{textwrap.shorten(text or '', width=80)}<br>Replies: {count}"
+        + (f"<br>{more} more replies not shown" if more else '')
+        for author, text, count, more in zip(authors, texts, replies, hidden)
+    ]
+
+    node_trace = go.Scattergl(
+        x=x, y=y,
+        mode='markers',
+        hoverinfo='text',
+        text=node_text,
+        marker=dict(
+            showscale=False,
+            colorscale='YlGnBu',
+            size=10 + 2 * np.log1p(hidden),
+            color=replies,
+            line_width=2))
+
+    title = f"{len(nodes) + int(hidden.sum())} nodes, {int(np.count_nonzero(replies > 1))} branches"
+    if hidden.any():
+        title += f" ({len(nodes)} shown)"
+    title += f"<br>Author: {authors[0]}<br>" + '<br>'.join(textwrap.wrap(texts[0] or 'No text available', width=40)[:3])
+    return edge_trace, node_trace, title
+
+def _hide_axes(fig, row, col):
+    fig.update_xaxes(showticklabels=False, showgrid=False, zeroline=False, row=row, col=col)
+    fig.update_yaxes(showticklabels=False, showgrid=False, zeroline=False, row=row, col=col)
 
-def visualize_subgraphs(G, subgraphs, account_names, num_to_show=20):
+def visualize_subgraphs(G, subgraphs, account_names, num_to_show=20, node_budget=2000):
     """
     Visualize interesting subgraphs using Plotly.
-    
+
     Args:
-        G (nx.Graph): Full graph
-        subgraphs (list): List of subgraphs to visualize
+        G (ReplyForest): Full reply forest
+        subgraphs (list): List of subgraphs (node indices) to visualize
         account_names (dict): Mapping of account IDs to usernames
         num_to_show (int): Number of subgraphs to visualize
-    
+        node_budget (int): Maximum number of tweets drawn per subgraph
+
     Returns:
         plotly.graph_objs._figure.Figure: The Plotly figure object
     """
     grid_size = math.ceil(math.sqrt(num_to_show))
-    fig = make_subplots(rows=grid_size, cols=grid_size, subplot_titles=[f"Subgraph {i+1}" for i in range(num_to_show)])
+    traces = [thread_traces(G, subgraph_nodes[0], account_names, node_budget) for subgraph_nodes in subgraphs[:num_to_show]]
+    fig = make_subplots(rows=grid_size, cols=grid_size,
+                        subplot_titles=[f"Subgraph {i+1} ({title.split('<br>')[0]})" for i, (_, _, title) in enumerate(traces)])
 
-    for i, subgraph_nodes in enumerate(subgraphs[:num_to_show]):
-        subgraph = G.subgraph(subgraph_nodes)
+    for i, (edge_trace, node_trace, _) in enumerate(traces):
         row = i // grid_size + 1
         col = i % grid_size + 1
-        
-        root_tweet = next(node for node in subgraph if subgraph.in_degree(node) == 0)
-        node_data = G.nodes[root_tweet]
-        account_id = str(node_data.get('account_id', 'Unknown'))
-        author = account_names.get(account_id, f"Unknown (ID: {account_id})")
-        text = node_data.get('full_text', 'No text available')
-
-        pos = custom_layout(subgraph)
-        
-        edge_x = []
-        edge_y = []
-        for edge in subgraph.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_x.extend([x0, x1, None])
-            edge_y.extend([y0, y1, None])
-
-        edge_trace = go.Scatter(
-            x=edge_x, y=edge_y,
-            line=dict(width=0.5, color='#888'),
-            hoverinfo='none',
-            mode='lines')
-
-        node_x = [pos[node][0] for node in subgraph.nodes()]
-        node_y = [pos[node][1] for node in subgraph.nodes()]
-
-        node_trace = go.Scatter(
-            x=node_x, y=node_y,
-            mode='markers',
-            hoverinfo='text',
-            marker=dict(
-                showscale=False,
-                colorscale='YlGnBu',
-                size=10,
-                color=[],
-                line_width=2))
-
-        node_adjacencies = []
-        node_text = []
-        for node in subgraph.nodes():
-            node_adjacencies.append(len(list(subgraph.neighbors(node))))
-            node_text.append(f'Node: {node}<br>Connections: {len(list(subgraph.neighbors(node)))}')
-
-        node_trace.marker.color = node_adjacencies
-        node_trace.text = node_text
-
         fig.add_trace(edge_trace, row=row, col=col)
         fig.add_trace(node_trace, row=row, col=col)
-
-        num_branches = count_branches(subgraph)
-        title = f"Subgraph {i+1} ({len(subgraph_nodes)} nodes, {num_branches} branches)<br>Author: {author}<br>"
-        title += textwrap.fill(text, width=40)
-        fig.update_xaxes(showticklabels=False, showgrid=False, zeroline=False, row=row, col=col)
-        fig.update_yaxes(showticklabels=False, showgrid=False, zeroline=False, row=row, col=col)
+        _hide_axes(fig, row, col)
 
     fig.update_layout(showlegend=False, title_text="Tweet Subgraphs Visualization", height=1000, width=1000)
     return fig
+
+def visualize_page(G, subgraphs, account_names, page=0, per_page=1, node_budget=5000):
+    """
+    Visualize one page of subgraphs, one full-width plot per thread.
+
+    Args:
+        G (ReplyForest): Full reply forest
+        subgraphs (list): List of subgraphs (node indices), in ranking order
+        account_names (dict): Mapping of account IDs to usernames
+        page (int): Zero-based page number
+        per_page (int): Number of subgraphs per page
+        node_budget (int): Maximum number of tweets drawn per subgraph
+
+    Returns:
+        plotly.graph_objs._figure.Figure: The Plotly figure object, or None if the page is empty
+    """
+    first = page * per_page
+    shown = subgraphs[first:first + per_page]
+    if not shown:
+        return None
+
+    traces = [thread_traces(G, subgraph_nodes[0], account_names, node_budget) for subgraph_nodes in shown]
+    fig = make_subplots(rows=len(traces), cols=1, vertical_spacing=0.12 / len(traces),
+                        subplot_titles=[f"Subgraph {first + i + 1}: {title}" for i, (_, _, title) in enumerate(traces)])
+    for i, (edge_trace, node_trace, _) in enumerate(traces):
+        fig.add_trace(edge_trace, row=i + 1, col=1)
+        fig.add_trace(node_trace, row=i + 1, col=1)
+        _hide_axes(fig, i + 1, 1)
+
+    pages = math.ceil(len(subgraphs) / per_page)
+    fig.update_layout(showlegend=False, title_text=f"Tweet Subgraphs, page {page + 1} of {pages}",
+                      height=700 * len(traces), width=1000)
+    return fig
@@ -1,31 +1,71 @@
 import logging
+from calendar import day_name
 from collections import Counter
-import logging
-from dateutil.parser import parse
+from datetime import datetime, timezone
+from common.fetch_data import stream_user_tweets
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Tweet fields read by UserStats; the fetcher only downloads these
+COLUMNS = ['created_at', 'favorite_count', 'retweet_count', 'reply_to_tweet_id']
+
 class UserStats:
-    def __init__(self, tweets):
-        self.user_tweets = tweets
+    """
+    Running user statistics. Feed tweets in with `update`, one batch at a time if they are
+    being streamed; only counters are kept, never the tweets themselves.
+    """
+
+    def __init__(self, tweets=None):
+        self.total_tweets = 0
+        self.total_likes = 0
+        self.total_retweets = 0
+        self.total_replies = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.hour_counts = Counter()
+        self.day_counts = Counter()
+        self.sample = None
+        if tweets:
+            self.update(tweets)
+
+    def update(self, tweets):
+        if self.sample is None and tweets:
+            self.sample = tweets[0]
+
+        timestamps = [tweet.created_ts for tweet in tweets]
+        if not timestamps:
+            return
+        self.total_tweets += len(timestamps)
+        self.total_likes += sum(tweet.favorite_count for tweet in tweets)
+        self.total_retweets += sum(tweet.retweet_count for tweet in tweets)
+        self.total_replies += sum(1 for tweet in tweets if tweet.reply_to_tweet_id is not None)
+
+        first_ts, last_ts = min(timestamps), max(timestamps)
+        self.first_ts = first_ts if self.first_ts is None else min(self.first_ts, first_ts)
+        self.last_ts = last_ts if self.last_ts is None else max(self.last_ts, last_ts)
+
+        # Most active hours and days (UTC) straight from the epoch seconds;
+        # 1970-01-01 was a Thursday, hence the +3 to get Monday=0
+        self.hour_counts.update(ts // 3600 % 24 for ts in timestamps)
+        self.day_counts.update(day_name[(ts // 86400 + 3) % 7] for ts in timestamps)
 
     def get_user_stats(self, username):
+        if not self.total_tweets:
+            return None
 
-        total_tweets = len(self.user_tweets)
-        total_likes = sum(tweet['favorite_count'] for tweet in self.user_tweets)
-        total_retweets = sum(tweet['retweet_count'] for tweet in self.user_tweets)
-        total_replies = sum(1 for tweet in self.user_tweets if tweet['reply_to_tweet_id'] is not None)
+        total_tweets = self.total_tweets
+        total_likes = self.total_likes
+        total_retweets = self.total_retweets
+        total_replies = self.total_replies
 
-        first_tweet_date = min(parse(tweet['created_at']) for tweet in self.user_tweets)
-        last_tweet_date = max(parse(tweet['created_at']) for tweet in self.user_tweets)
+        first_tweet_date = datetime.fromtimestamp(self.first_ts, timezone.utc)
+        last_tweet_date = datetime.fromtimestamp(self.last_ts, timezone.utc)
 
         date_range = (last_tweet_date - first_tweet_date).days + 1
         weeks = date_range / 7
 
-        # Calculate most active hours and days
-        hour_counts = Counter(parse(tweet['created_at']).hour for tweet in self.user_tweets)
-        day_counts = Counter(parse(tweet['created_at']).strftime('%A') for tweet in self.user_tweets)
+        hour_counts, day_counts = self.hour_counts, self.day_counts
         most_active_hours = sorted(hour_counts, key=hour_counts.get, reverse=True)[:3]
         most_active_days = sorted(day_counts, key=day_counts.get, reverse=True)[:3]
 
@@ -63,24 +103,34 @@ class UserStats:
         logger.info(f"Last tweet date: {stats['last_tweet_date']}")
 
     def print_sample_data(self):
-        if self.tweets:
+        if self.sample is not None:
             logger.info("Sample Tweet:")
-            logger.info(str(self.tweets[0]))
+            logger.info(str(self.sample.to_dict()))
         else:
             logger.warning("No tweets available to display as sample.")
 
 
-def user_stats_main(args, tweets_dict):
+def user_stats_main(args, tweets_dict=None):
+    """
+    Stats for the first username. Without `tweets_dict` the user's tweets are streamed
+    batch by batch and folded into the stats as they arrive.
+    """
+    username = args.usernames[0]
     try:
-        user_tweets = tweets_dict[args.usernames[0]]
-        user_stats = UserStats(user_tweets)
+        if tweets_dict is None:
+            user_stats = UserStats()
+            for batch in stream_user_tweets(username, args):
+                user_stats.update(batch)
+                logger.info(f"Processed {user_stats.total_tweets} tweets for @{username}")
+        else:
+            user_stats = UserStats(tweets_dict[username])
 
-        stats = user_stats.get_user_stats(args.usernames[0])
+        stats = user_stats.get_user_stats(username)
         if stats:
             user_stats.print_user_stats(stats)  # Keep this for console logging
             return stats
         else:
-            logger.warning(f"Error calculating stats for user: {args.usernames[0]}")
+            logger.warning(f"Error calculating stats for user: {username}")
             return None
 
     except Exception as e: